@@ -0,0 +1,38 @@
+"""login failures for brute-force throttling
+
+Revision ID: 4e2a7c9d1b85
+Revises: 9c61f0e7b2d4
+Create Date: 2026-10-16 23:18:52.904716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e2a7c9d1b85'
+down_revision: Union[str, Sequence[str], None] = '9c61f0e7b2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'login_failures',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('key', sa.String(length=200), nullable=False),
+        sa.Column('ts', sa.DateTime(timezone=True), server_default=sa.text('clock_timestamp()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_login_failures_key_ts', 'login_failures', ['key', 'ts'], unique=False)
+    op.create_index('ix_login_failures_ts', 'login_failures', ['ts'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_login_failures_ts', table_name='login_failures')
+    op.drop_index('ix_login_failures_key_ts', table_name='login_failures')
+    op.drop_table('login_failures')
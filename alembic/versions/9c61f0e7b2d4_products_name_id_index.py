@@ -0,0 +1,28 @@
+"""products name, id index for paginated listings
+
+Revision ID: 9c61f0e7b2d4
+Revises: d5b8e2f41a97
+Create Date: 2026-10-16 22:41:08.226519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c61f0e7b2d4'
+down_revision: Union[str, Sequence[str], None] = 'd5b8e2f41a97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_products_name_id', 'products', ['name', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_name_id', table_name='products')
@@ -0,0 +1,30 @@
+"""entrance document items indexes
+
+Revision ID: a7d4e9b05c38
+Revises: f3a9c2d6b714
+Create Date: 2026-10-16 19:03:55.614092
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d4e9b05c38'
+down_revision: Union[str, Sequence[str], None] = 'f3a9c2d6b714'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_entrance_document_items_document_id', 'entrance_document_items', ['document_id'], unique=False)
+    op.create_index('ix_entrance_document_items_product_id', 'entrance_document_items', ['product_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_entrance_document_items_product_id', table_name='entrance_document_items')
+    op.drop_index('ix_entrance_document_items_document_id', table_name='entrance_document_items')
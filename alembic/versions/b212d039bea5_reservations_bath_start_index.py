@@ -0,0 +1,28 @@
+"""index reservations by bath_id, start_datetime
+
+Revision ID: b212d039bea5
+Revises: b613da94f7d4
+Create Date: 2026-10-16 11:02:17.554096
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b212d039bea5'
+down_revision: Union[str, Sequence[str], None] = 'b613da94f7d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_reservations_bath_id_start_datetime', 'reservations', ['bath_id', 'start_datetime'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reservations_bath_id_start_datetime', table_name='reservations')
@@ -0,0 +1,51 @@
+"""reservation busy_range with gist exclusion constraint
+
+Revision ID: b613da94f7d4
+Revises: f9d12b09821d
+Create Date: 2026-10-16 10:12:41.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b613da94f7d4'
+down_revision: Union[str, Sequence[str], None] = 'f9d12b09821d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    # timestamptz + interval помечен в Postgres как STABLE, а генерируемой колонке нужно
+    # IMMUTABLE-выражение. Фиксированные 30 минут от часового пояса не зависят,
+    # поэтому обёртка честно объявлена IMMUTABLE.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION reservation_busy_range(start_at timestamptz, end_at timestamptz)
+        RETURNS tstzrange
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$ SELECT tstzrange(start_at, end_at + interval '30 minutes', '[)') $$
+    """)
+    op.execute("""
+        ALTER TABLE reservations
+        ADD COLUMN busy_range tstzrange
+        GENERATED ALWAYS AS (reservation_busy_range(start_datetime, end_datetime)) STORED
+    """)
+    # Ограничение строит GiST-индекс по (bath_id, busy_range), им же пользуется check_overlap.
+    # Если в таблице уже есть пересекающиеся брони, миграция упадёт — их нужно развести вручную.
+    op.execute("""
+        ALTER TABLE reservations
+        ADD CONSTRAINT reservations_no_overlap
+        EXCLUDE USING gist (bath_id WITH =, busy_range WITH &&)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE reservations DROP CONSTRAINT reservations_no_overlap")
+    op.drop_column('reservations', 'busy_range')
+    op.execute("DROP FUNCTION reservation_busy_range(timestamptz, timestamptz)")
@@ -0,0 +1,29 @@
+"""photo variants for responsive images
+
+Revision ID: c4e7a1d93f20
+Revises: b212d039bea5
+Create Date: 2026-10-16 14:20:41.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e7a1d93f20'
+down_revision: Union[str, Sequence[str], None] = 'b212d039bea5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('photos', sa.Column('variants', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('photos', 'variants')
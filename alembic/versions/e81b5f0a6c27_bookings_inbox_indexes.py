@@ -0,0 +1,31 @@
+"""bookings inbox indexes
+
+Revision ID: e81b5f0a6c27
+Revises: c4e7a1d93f20
+Create Date: 2026-10-16 16:05:12.840317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e81b5f0a6c27'
+down_revision: Union[str, Sequence[str], None] = 'c4e7a1d93f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_bookings_created_at_booking_id', 'bookings', ['created_at', 'booking_id'], unique=False)
+    op.create_index('ix_bookings_unread', 'bookings', ['created_at', 'booking_id'], unique=False,
+                    postgresql_where=sa.text('is_read = false'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_bookings_unread', table_name='bookings', postgresql_where=sa.text('is_read = false'))
+    op.drop_index('ix_bookings_created_at_booking_id', table_name='bookings')
@@ -0,0 +1,48 @@
+"""stock movements ledger
+
+Revision ID: f3a9c2d6b714
+Revises: e81b5f0a6c27
+Create Date: 2026-10-16 18:12:40.227815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c2d6b714'
+down_revision: Union[str, Sequence[str], None] = 'e81b5f0a6c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'stock_movements',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('ts', sa.DateTime(timezone=True), server_default=sa.text('clock_timestamp()'), nullable=False),
+        sa.Column('delta', sa.Float(), nullable=False),
+        sa.Column('balance', sa.Float(), nullable=False),
+        sa.Column('reason', sa.String(length=20), nullable=False),
+        sa.Column('reservation_id', sa.Integer(), nullable=True),
+        sa.Column('document_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_stock_movements_product_id_ts', 'stock_movements', ['product_id', 'ts', 'id'], unique=False)
+    # Истории до журнала нет: текущий остаток становится начальным движением
+    op.execute(
+        "INSERT INTO stock_movements (product_id, delta, balance, reason) "
+        "SELECT id, total_quantity, total_quantity, 'initial' FROM products "
+        "WHERE coalesce(total_quantity, 0) <> 0 ORDER BY id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stock_movements_product_id_ts', table_name='stock_movements')
+    op.drop_table('stock_movements')
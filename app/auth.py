@@ -1,15 +1,18 @@
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
-from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordBearer
+from typing import Optional
 
 from app import models, schemas, database
 from app.security import verify_password
+from app.services import user_cache
 
 import os
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/admin/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/admin/login", auto_error=False)
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-fallback-secret-key")
 ALGORITHM = "HS256"
@@ -22,16 +25,14 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(
-    db: Session = Depends(database.get_db),
-    token: str = Depends(oauth2_scheme)  
-):
-
+async def _user_from_token(db: AsyncSession, token: str):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if not token:
+        raise credentials_exception
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub") 
@@ -39,8 +40,37 @@ def get_current_user(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.user_id == int(user_id)).first()
+    try:
+        user_id = int(user_id)
+    except ValueError:
+        raise credentials_exception
+
+    # Токен уже доказывает, кто это; из БД нужно лишь узнать, что пользователь жив и активен
+    cached = user_cache.cache.get(user_id)
+    if cached is not None:
+        return cached
+    generation = user_cache.cache.generation
+    user = await db.get(models.User, user_id)
     if user is None or not user.is_active:
         raise credentials_exception
-    return user
+    cached = user_cache.CachedUser.model_validate(user)
+    user_cache.cache.put(cached, generation)
+    return cached
 
+async def get_current_user(
+    db: AsyncSession = Depends(database.get_db),
+    token: str = Depends(oauth2_scheme)  
+) -> user_cache.CachedUser:
+    return await _user_from_token(db, token)
+
+async def get_stream_user(
+    header_token: Optional[str] = Depends(optional_oauth2_scheme),
+    token: Optional[str] = Query(None)
+):
+    """
+    Для долгих соединений (SSE): EventSource не умеет передавать заголовки, поэтому
+    токен можно передать в ?token=. Сессия закрывается сразу, чтобы поток событий
+    не держал соединение с БД.
+    """
+    async with database.AsyncSessionLocal() as db:
+        return await _user_from_token(db, header_token or token)
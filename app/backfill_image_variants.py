@@ -0,0 +1,69 @@
+"""
+Уменьшенные копии (thumb/medium/large, JPEG и WebP) для уже загруженных фото:
+
+    python -m app.backfill_image_variants            # только фото без копий
+    python -m app.backfill_image_variants --force    # пересоздать все
+
+Фото читаются пачками по photo_id, изображения обрабатываются пулом процессов;
+запускать можно при работающем приложении — каталог бань сбросится и в нём.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from sqlalchemy import select
+
+from app import database, models
+from app.services import catalog, images
+
+
+async def backfill(batch_size: int, force: bool) -> None:
+    last_id = done = failed = 0
+    bath_ids = set()
+    started = time.perf_counter()
+    try:
+        while True:
+            query = (
+                select(models.Photo.photo_id, models.Photo.image_url, models.Photo.bath_id)
+                .where(models.Photo.photo_id > last_id)
+                .order_by(models.Photo.photo_id)
+                .limit(batch_size)
+            )
+            if not force:
+                query = query.where(models.Photo.variants.is_(None))
+            async with database.AsyncSessionLocal() as db:
+                photos = (await db.execute(query)).all()
+            if not photos:
+                break
+            last_id = photos[-1].photo_id
+
+            results = await images.render((photo.image_url for photo in photos), force)
+            await images.save_variants({photo.photo_id: variants for photo, variants in zip(photos, results)})
+            done += sum(variants is not None for variants in results)
+            failed += sum(variants is None for variants in results)
+            bath_ids.update(photo.bath_id for photo in photos if photo.bath_id is not None)
+            print(f"  до photo_id {last_id}: готово {done}, без копий {failed}")
+
+        for bath_id in bath_ids:
+            await catalog.invalidate(bath_id)
+    finally:
+        images.shutdown()
+        await database.async_engine.dispose()
+    print(f"Готово за {time.perf_counter() - started:.1f} с: копии для {done} фото, "
+          f"{failed} пропущено (не локальные или не читаются)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Уменьшенные копии для загруженных фото")
+    parser.add_argument("--force", action="store_true", help="пересоздать копии для всех фото")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="процессов для обработки")
+    args = parser.parse_args(argv)
+
+    images.IMAGE_WORKERS = args.workers
+    asyncio.run(backfill(args.batch_size, args.force))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,37 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 import os
-from dotenv import load_dotenv  
+from dotenv import load_dotenv
+
+from app import instrumentation
 
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Роутеры работают через asyncpg; если отдельный URL не задан, берём DATABASE_URL с другим драйвером
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or make_url(SQLALCHEMY_DATABASE_URL)\
+    .set(drivername="postgresql+asyncpg")\
+    .render_as_string(hide_password=False)
+
 
+# Синхронный движок — для create_all, скриптов и Alembic
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=instrumentation.TimedQueuePool)
+instrumentation.install(async_engine)
+
+# После commit объекты не сбрасываются: в async-сессии ленивой подгрузки нет
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 Base = declarative_base()
\ No newline at end of file
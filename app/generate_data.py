@@ -0,0 +1,402 @@
+"""
+Генератор синтетических данных для проверки на объёмах продакшена и больше:
+
+    python -m app.generate_data --reservations 1000000 --reset
+
+Остальные объёмы по умолчанию считаются от числа броней, каждый можно задать
+отдельно (--products 20000). Данные пишутся во временные файлы и загружаются
+через COPY одной транзакцией. Соблюдаются правила приложения: брони одной бани
+не пересекаются с учётом 30 минут уборки, остаток товара не уходит в минус —
+приход всегда раньше расхода, а products.total_quantity, last_purchase_price
+и журнал stock_movements совпадают с документами и бронями.
+
+--reset очищает ВСЕ таблицы — запускать только на отдельной базе.
+"""
+import argparse
+import heapq
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select, text
+
+from app import models
+from app.database import Base, engine
+from app.security import hash_password
+from app.services import pricing, stock
+
+
+ADMIN_USERNAME = "admin"
+ADMIN_PASSWORD = "admin"
+
+CLEANING = timedelta(minutes=30)
+OPEN_HOUR, CLOSE_HOUR = 10, 23
+TIMELINE_START = datetime(2020, 1, 1, OPEN_HOUR, tzinfo=timezone.utc)
+
+STATUS_NEW, STATUS_CONFIRMED, STATUS_CANCELLED = 1, 2, 3
+UNITS = ["шт", "кг", "л", "уп"]
+
+FIRST_NAMES = ["Иван", "Пётр", "Анна", "Мария", "Олег", "Елена", "Сергей", "Ольга", "Дмитрий", "Наталья"]
+LAST_NAMES = ["Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов", "Новиков"]
+
+
+def default_volumes(reservations: int) -> dict:
+    """Объёмы по числу броней: ~5 000 броней (лет пять) на баню, документ прихода на 10 броней."""
+    return {
+        "reservations": reservations,
+        "baths": max(12, reservations // 5000),
+        "clients": max(100, reservations // 5),
+        "bookings": reservations * 2 // 5,
+        "documents": max(10, reservations // 10),
+        "partners": 200,
+        "products": 2000,
+        "categories": 60,
+    }
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return r"\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    value = str(value)
+    if "\\" in value or "\t" in value or "\n" in value or "\r" in value:
+        value = value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return value
+
+
+class CopyFile:
+    """Строки одной таблицы во временном файле в текстовом формате COPY."""
+
+    def __init__(self, table, columns):
+        self.table = table
+        self.columns = columns
+        self.rows = 0
+        self.file = tempfile.TemporaryFile("w+", encoding="utf-8")
+
+    def write(self, *values):
+        self.file.write("\t".join(map(_copy_value, values)))
+        self.file.write("\n")
+        self.rows += 1
+
+    def load(self, cursor):
+        self.file.seek(0)
+        cursor.copy_expert(f"COPY {self.table.name} ({', '.join(self.columns)}) FROM STDIN", self.file)
+        self.file.close()
+
+
+class Generator:
+    def __init__(self, volumes: dict, rng: random.Random, unit_ids):
+        self.volumes = volumes
+        self.rng = rng
+        self.unit_ids = unit_ids
+        self.files = {}
+
+    def out(self, model, *columns) -> CopyFile:
+        table = model.__table__
+        self.files[table.name] = CopyFile(table, columns)
+        return self.files[table.name]
+
+    def person(self):
+        return f"{self.rng.choice(LAST_NAMES)} {self.rng.choice(FIRST_NAMES)}"
+
+    def phone(self):
+        return f"+79{self.rng.randrange(10 ** 9):09d}"
+
+    def run(self):
+        self.baths()
+        self.categories()
+        self.partners()
+        self.clients()
+        self.timeline()
+        self.products()
+        self.bookings()
+        return self.files
+
+    def baths(self):
+        rng = self.rng
+        baths = self.out(models.Bath, "bath_id", "name", "title", "cost", "description", "base_guests", "extra_guest_price")
+        features = self.out(models.BathFeature, "key", "value", "bath_id")
+        self.bath_ids = list(range(1, self.volumes["baths"] + 1))
+        # Тарифы нужны броням: стоимость считается тем же pricing.price_reservation, что и в API
+        self.bath_tariffs = {}
+        for bath_id in self.bath_ids:
+            self.bath_tariffs[bath_id] = tariff = pricing.BathTariff(
+                rng.choice([1500, 2000, 2500, 3000, 4000]), rng.choice([4, 6, 8]), rng.choice([300, 500])
+            )
+            baths.write(bath_id, f"Баня {bath_id}", f"Баня №{bath_id}", tariff.cost, "Русская баня на дровах. " * 10,
+                        tariff.base_guests, tariff.extra_guest_price)
+            for key, value in (("Парная", f"{rng.randint(8, 20)} м²"), ("Бассейн", rng.choice(["есть", "нет"])),
+                               ("Вместимость", f"до {rng.randint(6, 16)} человек"), ("Веники", "дубовые, берёзовые")):
+                features.write(key, value, bath_id)
+
+    def categories(self):
+        """Дерево: корни → подкатегории → листья; товары лежат в листьях."""
+        rng = self.rng
+        categories = self.out(models.Category, "id", "name", "parent_id")
+        total = self.volumes["categories"]
+        roots = max(1, total // 10)
+        self.category_ids = list(range(1, total + 1))
+        parents = {}
+        for category_id in self.category_ids:
+            parent_id = None
+            if category_id > roots:
+                # Родитель всегда создан раньше — дерево без циклов
+                parent_id = rng.randint(1, category_id - 1)
+            parents[category_id] = parent_id
+            categories.write(category_id, f"Категория {category_id}", parent_id)
+        has_children = {p for p in parents.values() if p is not None}
+        self.leaf_category_ids = [c for c in self.category_ids if c not in has_children]
+
+    def partners(self):
+        partners = self.out(models.Partner, "partner_id", "supplier_name", "person_name", "partner_inn", "partner_phone", "partner_email")
+        self.partner_ids = list(range(1, self.volumes["partners"] + 1))
+        for partner_id in self.partner_ids:
+            partners.write(partner_id, f"ООО «Поставщик {partner_id}»", self.person(), f"{7700000000 + partner_id:012d}",
+                           self.phone(), f"supplier{partner_id}@example.com")
+
+    def clients(self):
+        rng = self.rng
+        clients = self.out(models.Client, "client_id", "full_name", "phone", "email", "birth_date")
+        self.client_list = []
+        for client_id in range(1, self.volumes["clients"] + 1):
+            name, phone = self.person(), self.phone()
+            email = f"client{client_id}@example.com" if rng.random() < 0.5 else None
+            self.client_list.append((name, phone, email))
+            clients.write(client_id, name, phone, email,
+                          f"{rng.randint(1960, 2004)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+
+    def next_start(self, end: datetime) -> datetime:
+        """Начало следующей брони бани: после уборки, в часы работы."""
+        start = end + CLEANING + timedelta(minutes=30 * self.rng.randint(0, 4))
+        if start.hour >= CLOSE_HOUR - 2 or start.hour < OPEN_HOUR:
+            day = start.date() + timedelta(days=1 if start.hour >= OPEN_HOUR else 0)
+            start = datetime(day.year, day.month, day.day, OPEN_HOUR, tzinfo=timezone.utc)
+            start += timedelta(minutes=30 * self.rng.randint(0, 6))
+        return start
+
+    def timeline(self):
+        """
+        Брони и приход в хронологическом порядке: приход добавляет остаток, брони его
+        расходуют, поэтому остаток на любой момент времени неотрицателен.
+        """
+        rng = self.rng
+        reservations = self.out(models.Reservation, "reservation_id", "bath_id", "start_datetime", "end_datetime",
+                                "client_name", "client_phone", "client_email", "notes", "total_cost", "guests",
+                                "status_id", "created_at")
+        reservation_products = self.out(models.ReservationProduct, "reservation_id", "product_id", "quantity")
+        documents = self.out(models.EntranceDocument, "id", "date", "supplier_id", "responsible_name", "supplier_number", "total_amount")
+        items = self.out(models.EntranceDocumentItem, "id", "document_id", "product_id", "quantity", "purchase_price")
+        self.movements = self.out(models.StockMovement, "id", "product_id", "ts", "delta", "balance", "reason",
+                                  "reservation_id", "document_id")
+        self.movement_id = 0
+
+        product_count = self.volumes["products"]
+        self.stock = [0] * (product_count + 1)
+        self.last_price = [0.0] * (product_count + 1)
+        self.base_price = [round(rng.uniform(30, 600), 2) for _ in range(product_count + 1)]
+
+        total = self.volumes["reservations"]
+        document_count = self.volumes["documents"]
+        # Документ прихода через каждые every броней; первый — до первой брони
+        every = max(1, total // document_count) if total else 1
+        document_id = item_id = 0
+
+        now = datetime.now(timezone.utc)
+        # Куча (начало следующей брони, баня): брони всех бань идут по времени
+        queue = [(TIMELINE_START + timedelta(minutes=30 * rng.randint(0, 8)), bath_id) for bath_id in self.bath_ids]
+        heapq.heapify(queue)
+
+        for reservation_id in range(1, total + 1):
+            start, bath_id = heapq.heappop(queue)
+
+            while document_id < document_count and (reservation_id - 1) // every >= document_id:
+                document_id += 1
+                amount = 0.0
+                for product_id in rng.sample(range(1, product_count + 1), min(product_count, rng.randint(3, 15))):
+                    quantity = rng.randint(20, 200)
+                    price = round(self.base_price[product_id] * rng.uniform(0.9, 1.1), 2)
+                    item_id += 1
+                    items.write(item_id, document_id, product_id, quantity, price)
+                    self.move(product_id, start, quantity, stock.ENTRANCE, document_id=document_id)
+                    self.last_price[product_id] = price
+                    amount += quantity * price
+                documents.write(document_id, start.date(), rng.choice(self.partner_ids), self.person(),
+                                f"ПН-{document_id}", round(amount, 2))
+
+            end = start + timedelta(hours=rng.randint(2, 5))
+            heapq.heappush(queue, (self.next_start(end), bath_id))
+
+            guests = rng.randint(1, 12)
+            if end < now:
+                status_id = STATUS_CANCELLED if rng.random() < 0.05 else STATUS_CONFIRMED
+            else:
+                status_id = rng.choice([STATUS_NEW, STATUS_CONFIRMED])
+            name, phone, email = rng.choice(self.client_list)
+
+            quantities = {}
+            if rng.random() < 0.6:
+                for product_id in rng.sample(range(1, product_count + 1), min(product_count, rng.randint(1, 4))):
+                    quantity = rng.randint(1, 3)
+                    if self.stock[product_id] >= quantity:
+                        self.move(product_id, start, -quantity, stock.RESERVATION, reservation_id=reservation_id)
+                        reservation_products.write(reservation_id, product_id, quantity)
+                        quantities[product_id] = quantity
+
+            # Товары по цене последней закупки на момент брони — как при создании через API
+            prices = {pid: pricing.ProductPrice(self.last_price[pid]) for pid in quantities}
+            price = pricing.price_reservation(self.bath_tariffs[bath_id], start, end, guests, prices, quantities)
+            reservations.write(reservation_id, bath_id, start, end, name, phone, email,
+                               "Комментарий администратора" if rng.random() < 0.1 else None,
+                               round(price.total_cost), guests, status_id,
+                               start - timedelta(days=rng.randint(0, 30)))
+
+        # Оставшиеся документы (если броней меньше, чем документов) — в конце периода
+        while document_id < document_count:
+            document_id += 1
+            product_id = rng.randint(1, product_count)
+            quantity, price = rng.randint(20, 200), self.base_price[product_id]
+            item_id += 1
+            at = queue[0][0] if queue else TIMELINE_START
+            items.write(item_id, document_id, product_id, quantity, price)
+            self.move(product_id, at, quantity, stock.ENTRANCE, document_id=document_id)
+            self.last_price[product_id] = price
+            documents.write(document_id, at.date(), rng.choice(self.partner_ids),
+                            self.person(), f"ПН-{document_id}", round(quantity * price, 2))
+
+    def move(self, product_id: int, ts: datetime, delta: int, reason: str,
+             reservation_id: int = None, document_id: int = None):
+        """Движение по складу с остатком после него; id растут в хронологическом порядке."""
+        self.stock[product_id] += delta
+        self.movement_id += 1
+        self.movements.write(self.movement_id, product_id, ts, delta, self.stock[product_id], reason,
+                             reservation_id, document_id)
+
+    def products(self):
+        """Пишутся после броней: остаток и цена уже посчитаны по документам и расходу."""
+        rng = self.rng
+        products = self.out(models.Product, "id", "name", "description", "is_visible_on_website", "category_id",
+                            "total_quantity", "last_purchase_price", "unit_id")
+        photos = self.out(models.Photo, "image_url", "bath_id", "product_id", "category_id")
+        for product_id in range(1, self.volumes["products"] + 1):
+            products.write(product_id, f"Товар {product_id}", "Описание товара" if rng.random() < 0.5 else None,
+                           rng.random() < 0.7, rng.choice(self.leaf_category_ids), self.stock[product_id],
+                           self.last_price[product_id], rng.choice(self.unit_ids))
+            photos.write(f"/img/products/{product_id}.jpg", None, product_id, None)
+        for bath_id in self.bath_ids:
+            for k in range(1, 6):
+                photos.write(f"/img/baths/{bath_id}_{k}.jpg", bath_id, None, None)
+        for category_id in self.category_ids:
+            photos.write(f"/img/categories/{category_id}.jpg", None, None, category_id)
+
+    def bookings(self):
+        rng = self.rng
+        bookings = self.out(models.Booking, "booking_id", "bath_id", "date", "duration_hours", "guests", "name",
+                            "phone", "email", "notes", "is_read", "created_at")
+        days = max(1, (datetime.now(timezone.utc) - TIMELINE_START).days)
+        for booking_id in range(1, self.volumes["bookings"] + 1):
+            created_at = TIMELINE_START + timedelta(days=rng.randrange(days), minutes=rng.randrange(24 * 60))
+            name, phone, email = rng.choice(self.client_list)
+            bookings.write(booking_id, rng.choice(self.bath_ids), (created_at + timedelta(days=rng.randint(1, 30))).date(),
+                           rng.randint(2, 5), rng.randint(1, 12), name, phone, email, None,
+                           rng.random() < 0.9, created_at)
+
+
+def reset(conn):
+    tables = ", ".join(t.name for t in Base.metadata.sorted_tables)
+    conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+
+
+def seed_reference(conn):
+    """Статусы, единицы измерения, роль и пользователь admin — без них API не работает."""
+    if not conn.scalar(select(func.count()).select_from(models.ReservationStatus)):
+        conn.execute(insert(models.ReservationStatus), [
+            {"id": STATUS_NEW, "status_name": "Новая"},
+            {"id": STATUS_CONFIRMED, "status_name": "Подтверждена"},
+            {"id": STATUS_CANCELLED, "status_name": "Отменена"},
+        ])
+    if not conn.scalar(select(func.count()).select_from(models.UnitOfMeasurement)):
+        conn.execute(insert(models.UnitOfMeasurement), [{"name": name} for name in UNITS])
+    role_id = conn.scalar(select(models.Role.id).where(models.Role.name == "admin"))
+    if role_id is None:
+        role_id = conn.scalar(insert(models.Role).values(name="admin").returning(models.Role.id))
+    if not conn.scalar(select(models.User.user_id).where(models.User.username == ADMIN_USERNAME)):
+        conn.execute(insert(models.User).values(
+            username=ADMIN_USERNAME,
+            password_hash=hash_password(ADMIN_PASSWORD),
+            role_id=role_id,
+            full_name="Администратор",
+            is_active=True,
+        ))
+
+
+def reset_sequences(conn):
+    """Строки загружены с явными id — последовательности продолжают после максимума."""
+    for table in Base.metadata.sorted_tables:
+        primary_key = list(table.primary_key.columns)
+        if len(primary_key) != 1 or primary_key[0].autoincrement is False:
+            continue
+        column = primary_key[0].name
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', '{column}'), "
+            f"coalesce((SELECT max({column}) FROM {table.name}), 0) + 1, false)"
+        ))
+
+
+def generate(volumes: dict, seed: int = 42, reset_first: bool = False, log=print):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        if reset_first:
+            reset(conn)
+        elif conn.scalar(select(func.count()).select_from(models.Reservation)) or \
+                conn.scalar(select(func.count()).select_from(models.Bath)):
+            sys.exit("В базе уже есть данные; добавьте --reset, чтобы очистить её")
+        seed_reference(conn)
+        unit_ids = list(conn.scalars(select(models.UnitOfMeasurement.id)))
+
+        started = time.perf_counter()
+        files = Generator(volumes, random.Random(seed), unit_ids).run()
+        log(f"Сгенерировано за {time.perf_counter() - started:.1f} с")
+
+        cursor = conn.connection.dbapi_connection.cursor()
+        for table in Base.metadata.sorted_tables:
+            copy_file = files.pop(table.name, None)
+            if copy_file is None:
+                continue
+            started = time.perf_counter()
+            rows = copy_file.rows
+            copy_file.load(cursor)
+            log(f"  {table.name:26} {rows:>10} строк за {time.perf_counter() - started:.1f} с")
+        reset_sequences(conn)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генератор синтетических данных")
+    parser.add_argument("--reservations", type=int, default=10000, help="число броней; от него считаются остальные объёмы")
+    for name in default_volumes(0):
+        if name != "reservations":
+            parser.add_argument(f"--{name}", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42, help="зерно генератора — одинаковые данные при повторе")
+    parser.add_argument("--reset", action="store_true", help="очистить все таблицы перед загрузкой")
+    args = parser.parse_args(argv)
+
+    volumes = default_volumes(args.reservations)
+    for name in volumes:
+        if getattr(args, name) is not None:
+            volumes[name] = getattr(args, name)
+
+    started = time.perf_counter()
+    generate(volumes, args.seed, args.reset)
+    print(f"Готово за {time.perf_counter() - started:.1f} с: {volumes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+logger = logging.getLogger(__name__)
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").lower() in ("1", "true", "yes")
+
+
+# Один и тот же запрос больше стольких раз за HTTP-запрос — вероятно, N+1
+REPEATED_QUERY_THRESHOLD = int(os.getenv("DB_REPEATED_QUERY_THRESHOLD", "10"))
+# Строгий режим (для тестов и CI): N+1 превращается в ошибку 500 вместо предупреждения
+STRICT_QUERIES = _env_flag("DB_STRICT_QUERIES")
+# Отладочные заголовки со счётчиком запросов и временем в БД
+DEBUG_HEADERS = _env_flag("DB_DEBUG_HEADERS")
+
+QUERY_COUNT_HEADER = "X-DB-Query-Count"
+QUERY_TIME_HEADER = "X-DB-Time-Ms"
+
+_LITERALS = re.compile(r"\$\d+|%\(\w+\)s|'(?:[^']|'')*'|\b\d+\b")
+_PARAM = r"\?(?:::[\w ]+(?:\[\])?)?"
+_IN_LISTS = re.compile(rf"\(\s*{_PARAM}(?:\s*,\s*{_PARAM})*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Текст запроса без параметров и литералов: отличаются только значения — форма одна."""
+    shape = _LITERALS.sub("?", statement)
+    shape = _IN_LISTS.sub("(?)", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+class RepeatedQueryError(RuntimeError):
+    """Строгий режим: запрос одной формы выполнен слишком много раз."""
+
+
+class RequestStats:
+    """Обращения к БД в рамках одного HTTP-запроса."""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.queries = 0
+        self.db_time = 0.0
+        self.checkout_waits: List[float] = []
+        self.shapes: Counter = Counter()
+
+    def repeated(self, threshold: int):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def start_request(route: str):
+    """Начинает сбор статистики; вернуть токен в finish_request."""
+    return _current.set(RequestStats(route))
+
+
+def finish_request(token) -> None:
+    _current.reset(token)
+
+
+def current() -> Optional[RequestStats]:
+    return _current.get()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, который запоминает, сколько запрос ждал свободное соединение."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            stats = _current.get()
+            if stats is not None:
+                stats.checkout_waits.append(time.perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+        stats.shapes[statement_shape(statement)] += 1
+
+
+def _handle_error(context):
+    # Упавший запрос тоже считается: after_cursor_execute для него не вызывается
+    conn = context.connection
+    if conn is not None and conn.info.get("query_started"):
+        _after_cursor_execute(conn, None, context.statement, context.parameters, None, False)
+
+
+def install(engine) -> None:
+    """Подключает счётчики к движку (для AsyncEngine — к его sync_engine)."""
+    target = getattr(engine, "sync_engine", engine)
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
+    event.listen(target, "handle_error", _handle_error)
+
+
+def check_repeated(stats: RequestStats, method: str, path: str) -> None:
+    repeated = stats.repeated(REPEATED_QUERY_THRESHOLD)
+    if not repeated:
+        return
+    shape, count = repeated[0]
+    message = f"{method} {path}: query executed {count} times (possible N+1): {shape[:300]}"
+    if STRICT_QUERIES:
+        raise RepeatedQueryError(message)
+    logger.warning(message)
+
+
+class QueryStatsMiddleware:
+    """
+    Проверяет запросы к БД перед отправкой ответа: предупреждает о повторяющихся
+    (в строгом режиме — падает) и, если включено, добавляет отладочные заголовки.
+    Статистику начинает MetricsMiddleware, без него — этот middleware.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = start_request(scope["path"]) if current() is None else None
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                stats = current()
+                check_repeated(stats, scope["method"], scope["path"])
+                if DEBUG_HEADERS:
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (QUERY_COUNT_HEADER.lower().encode(), str(stats.queries).encode()),
+                        (QUERY_TIME_HEADER.lower().encode(), f"{stats.db_time * 1000:.1f}".encode()),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if token is not None:
+                finish_request(token)
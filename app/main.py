@@ -1,14 +1,38 @@
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles  
-from app.database import Base, engine
+from contextlib import asynccontextmanager
+from app import security
+from app.database import Base, async_engine, engine
 from app.routers import api_router
+from app.pagination import NEXT_CURSOR_HEADER
+from app.metrics import MetricsMiddleware, mark_process_dead, metrics_endpoint
+from app.instrumentation import QUERY_COUNT_HEADER, QUERY_TIME_HEADER, QueryStatsMiddleware
+from app.services import availability, catalog, category_tree, events, images, user_cache
+from app.services.uploads import UploadLimitMiddleware
+from app.static_files import ImmutableStaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
 
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title='Бани')
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Изменения из других воркеров сбрасывают локальные кеши
+    events.broker.add_handler(availability.handle_event)
+    events.broker.add_handler(catalog.handle_event)
+    events.broker.add_handler(category_tree.handle_event)
+    events.broker.add_handler(user_cache.handle_event)
+    await events.broker.start()
+    yield
+    await events.broker.stop()
+    images.shutdown()
+    security.shutdown()
+    await async_engine.dispose()
+    mark_process_dead()
+
+
+app = FastAPI(title='Бани', lifespan=lifespan)
 
 
 app.add_middleware(
@@ -17,10 +41,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, QUERY_COUNT_HEADER, QUERY_TIME_HEADER],
 )
 
+# Большие загрузки отсекаются ещё при приёме тела
+app.add_middleware(UploadLimitMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+# Последним — значит снаружи всех остальных: в метрики попадает полное время ответа
+app.add_middleware(MetricsMiddleware)
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
 
 
-app.mount("/img", StaticFiles(directory="public/img"), name="static_images")
+app.mount("/img", ImmutableStaticFiles(directory="public/img"), name="static_images")
 
 app.include_router(api_router)
\ No newline at end of file
@@ -0,0 +1,113 @@
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match
+
+from app import instrumentation
+
+
+# При нескольких воркерах uvicorn метрики собираются через каталог PROMETHEUS_MULTIPROC_DIR
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# Для путей, не попавших ни в один маршрут (404), — одна метка вместо сырого пути
+UNMATCHED_ROUTE = "unmatched"
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status code",
+    ["method", "route", "status"],
+)
+LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being handled right now",
+    ["method", "route"], multiprocess_mode="livesum",
+)
+DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+DB_TIME = Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per HTTP request",
+    ["method", "route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a connection from the pool",
+    ["route"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+
+def route_template(app, scope) -> str:
+    """Шаблон маршрута (/api/admin/reservations/{id}), а не сырой путь — число меток ограничено."""
+    partial = UNMATCHED_ROUTE
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial == UNMATCHED_ROUTE:
+            # Путь совпал, метод нет (405)
+            partial = route.path
+    return partial
+
+
+class MetricsMiddleware:
+    """Чистый ASGI-middleware: не буферизует тело и не мешает потоковым ответам (SSE)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope["app"], scope)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = instrumentation.start_request(route)
+        in_progress = IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stats = instrumentation.current()
+            instrumentation.finish_request(token)
+            in_progress.dec()
+            LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            DB_QUERIES.labels(method, route).observe(stats.queries)
+            DB_TIME.labels(method, route).observe(stats.db_time)
+            for wait in stats.checkout_waits:
+                POOL_WAIT.labels(route).observe(wait)
+
+
+def metrics_endpoint(request: Request) -> Response:
+    """Метрики в текстовом формате Prometheus."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead() -> None:
+    """При остановке воркера: его livesum-значения больше не учитываются."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Float, Integer, String, Text, ForeignKey, DateTime, Boolean, Date, CheckConstraint, func
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, Float, Integer, String, Text, ForeignKey, DateTime, Boolean, Date, CheckConstraint, Computed, DDL, Index, event, func, text
+from sqlalchemy.orm import relationship, deferred
 from app.database import Base
 from datetime import date
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSTZRANGE, ExcludeConstraint
 
 
 class Bath(Base):
@@ -27,6 +27,8 @@ class Photo(Base):
 
     photo_id = Column(Integer, primary_key=True, index=True)
     image_url = Column(String(500), nullable=False)
+    # Уменьшенные копии для srcset: {"thumb": {"width", "height", "jpeg", "webp"}, ...}; NULL — ещё не готовы
+    variants = Column(JSONB(none_as_null=True), nullable=True)
 
     bath_id = Column(Integer, ForeignKey("baths.bath_id", ondelete="CASCADE"), nullable=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=True)
@@ -66,6 +68,13 @@ class Booking(Base):
 
     bath = relationship("Bath", back_populates="bookings")
 
+    __table_args__ = (
+        # Входящие заявки: новые сверху, постранично по (created_at, booking_id)
+        Index("ix_bookings_created_at_booking_id", "created_at", "booking_id"),
+        # Только непрочитанные — счётчик для значка в админке и фильтр unread
+        Index("ix_bookings_unread", "created_at", "booking_id", postgresql_where=text("is_read = false")),
+    )
+
 
 
 
@@ -96,11 +105,29 @@ class Reservation(Base):
     status_id = Column(Integer, ForeignKey('reservation_status.id'), nullable=False, default=1)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Время брони вместе с 30-минутной уборкой, считает сама БД
+    busy_range = deferred(Column(TSTZRANGE, Computed("reservation_busy_range(start_datetime, end_datetime)", persisted=True)))
 
     bath = relationship("Bath", back_populates="reservations")
     status_rel = relationship("ReservationStatus", back_populates="reservations")
     reservation_products = relationship("ReservationProduct", back_populates="reservation", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Две брони одной бани не могут пересекаться с учётом уборки
+        ExcludeConstraint(("bath_id", "="), ("busy_range", "&&"), name="reservations_no_overlap", using="gist"),
+        # Календарь: брони бани по времени
+        Index("ix_reservations_bath_id_start_datetime", "bath_id", "start_datetime"),
+    )
+
+
+# Для create_all: то же, что создаёт миграция b613da94f7d4
+event.listen(Reservation.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+event.listen(Reservation.__table__, "before_create", DDL(
+    "CREATE OR REPLACE FUNCTION reservation_busy_range(start_at timestamptz, end_at timestamptz) "
+    "RETURNS tstzrange LANGUAGE sql IMMUTABLE PARALLEL SAFE "
+    "AS $$ SELECT tstzrange(start_at, end_at + interval '30 minutes', '[)') $$"
+))
+
 
 # === Компания: Партнёры ===
 class Partner(Base):
@@ -159,6 +186,19 @@ class Product(Base):
     photos = relationship("Photo", back_populates="product")
     unit = relationship("UnitOfMeasurement")
 
+    __table_args__ = (
+        # Поиск в подборе товаров: ILIKE '%q%' по названию и описанию идёт по триграммам
+        Index("ix_products_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_products_description_trgm", "description", postgresql_using="gin",
+              postgresql_ops={"description": "gin_trgm_ops"}),
+        # Списки товаров постранично по (name, id)
+        Index("ix_products_name_id", "name", "id"),
+    )
+
+
+# Для create_all: то же, что создаёт миграция d5b8e2f41a97
+event.listen(Product.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
 
 class UnitOfMeasurement(Base):
     __tablename__ = "units_of_measurement"
@@ -195,6 +235,12 @@ class EntranceDocumentItem(Base):
     document = relationship("EntranceDocument", back_populates="items")
     product = relationship("Product")
 
+    __table_args__ = (
+        # Строки документа и последняя цена закупки товара
+        Index("ix_entrance_document_items_document_id", "document_id"),
+        Index("ix_entrance_document_items_product_id", "product_id"),
+    )
+
 
 # === Товары в бронировании ===
 class ReservationProduct(Base):
@@ -210,6 +256,33 @@ class ReservationProduct(Base):
     def __repr__(self):
         return f"<ReservationProduct reservation_id={self.reservation_id} product_id={self.product_id} qty={self.quantity}>"
 
+
+# === Склад: журнал движений ===
+class StockMovement(Base):
+    """
+    Каждое изменение остатка товара; строки только добавляются. balance — остаток
+    после движения, поэтому остаток на любой момент — одна строка, а не сумма истории.
+    Текущий остаток по-прежнему хранится в products.total_quantity.
+    """
+    __tablename__ = "stock_movements"
+
+    id = Column(BigInteger, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    # clock_timestamp, а не now(): время записи под блокировкой товара, а не начала транзакции
+    ts = Column(DateTime(timezone=True), nullable=False, server_default=func.clock_timestamp())
+    delta = Column(Float, nullable=False)
+    balance = Column(Float, nullable=False)
+    # reservation / entrance / initial
+    reason = Column(String(20), nullable=False)
+    # Без внешних ключей: история остаётся и после удаления брони или документа
+    reservation_id = Column(Integer, nullable=True)
+    document_id = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        # Остаток на дату: последняя строка товара не позже as_of
+        Index("ix_stock_movements_product_id_ts", "product_id", "ts", "id"),
+    )
+
 # Права доступа
 
 
@@ -248,4 +321,22 @@ class User(Base):
     email = Column(String)
     birth_date = Column(Date)
 
-    role_rel = relationship("Role")
\ No newline at end of file
+    role_rel = relationship("Role")
+
+
+# Попытки входа — общее хранилище ограничения перебора (LOGIN_THROTTLE_STORE=postgres).
+# Попытка пишется до проверки пароля и удаляется, если вход удался; остаются неудачные
+class LoginFailure(Base):
+    __tablename__ = "login_failures"
+
+    id = Column(BigInteger, primary_key=True)
+    # "user:<логин>" или "ip:<адрес>"
+    key = Column(String(200), nullable=False)
+    ts = Column(DateTime(timezone=True), nullable=False, server_default=func.clock_timestamp())
+
+    __table_args__ = (
+        # Попытки ключа в окне
+        Index("ix_login_failures_key_ts", "key", "ts"),
+        # Удаление вышедших из окна
+        Index("ix_login_failures_ts", "ts"),
+    )
\ No newline at end of file
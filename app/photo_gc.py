@@ -0,0 +1,171 @@
+"""
+Сборщик файлов фото, на которые больше не ссылается ни одна запись photos:
+
+    python -m app.photo_gc                              # отчёт, ничего не трогает
+    python -m app.photo_gc --mode quarantine            # перенести в photo_quarantine/
+    python -m app.photo_gc --mode delete --grace-hours 48
+
+Файлы каталогов загрузки потоком уходят в БД через COPY во временную таблицу,
+неиспользуемые находит сам Postgres (anti-join с photos), результат читается
+курсором на сервере — в памяти процесса не держится ни список файлов, ни список фото.
+Уменьшенные копии (abc.thumb.webp) живут, пока есть запись с оригиналом (abc.jpg).
+Файлы моложе --grace-hours не трогаются: загрузка могла ещё не закоммитить запись.
+Запускать по расписанию (cron) или вручную.
+"""
+import argparse
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+from sqlalchemy import text
+
+from app.database import engine
+from app.services import uploads
+from app.services.images import VARIANT_WIDTHS
+
+
+UPLOAD_DIRS = [uploads.PUBLIC_DIR / "img" / kind for kind in ("baths", "products", "categories")]
+QUARANTINE_DIR = Path(os.getenv("PHOTO_QUARANTINE_DIR", "photo_quarantine"))
+GRACE_HOURS = float(os.getenv("PHOTO_GC_GRACE_HOURS", "24"))
+BATCH_SIZE = 1000
+
+
+def walk(directory: Path) -> Iterator[os.DirEntry]:
+    """Все файлы каталога с подкаталогами, без списка в памяти."""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk(Path(entry.path))
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def owner_url(url: str) -> Optional[str]:
+    """/img/x/ab/abc.thumb.webp → /img/x/ab/abc (имя оригинала без расширения); None — не копия."""
+    parts = url.rsplit(".", 2)
+    if len(parts) == 3 and parts[1] in VARIANT_WIDTHS and "/" not in parts[2]:
+        return parts[0]
+    return None
+
+
+class FilesReader:
+    """Файловый объект для COPY: строки «url, owner, size, mtime» по мере обхода каталогов."""
+
+    def __init__(self, directories):
+        self.rows = (self.row(entry) for directory in directories if directory.is_dir() for entry in walk(directory))
+        self.buffer = ""
+        self.files = 0
+
+    def row(self, entry: os.DirEntry) -> str:
+        self.files += 1
+        stat = entry.stat(follow_symlinks=False)
+        url = uploads.url_for(Path(entry.path))
+        fields = [url, owner_url(url) or r"\N", str(stat.st_size), repr(stat.st_mtime)]
+        return "\t".join(f.replace("\\", "\\\\").replace("\t", "\\t") if f != r"\N" else f for f in fields) + "\n"
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self.buffer) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.buffer += row
+        if size < 0:
+            size = len(self.buffer)
+        chunk, self.buffer = self.buffer[:size], self.buffer[size:]
+        return chunk
+
+    readline = read
+
+
+ORPHANS = """
+    SELECT f.url, f.size FROM gc_files f
+    WHERE f.mtime < :cutoff
+      AND NOT EXISTS (SELECT 1 FROM photos p WHERE p.image_url = f.url)
+      AND (f.owner IS NULL OR NOT EXISTS (
+          SELECT 1 FROM photos p WHERE regexp_replace(p.image_url, '\\.[^./]*$', '') = f.owner
+      ))
+    ORDER BY f.url
+"""
+
+# Повторная проверка пачки прямо перед удалением: фото могли загрузить, пока шёл обход
+STILL_REFERENCED = """
+    SELECT image_url FROM photos
+    WHERE image_url = ANY(:urls) OR regexp_replace(image_url, '\\.[^./]*$', '') = ANY(:owners)
+"""
+
+
+def dispose(path: Path, mode: str) -> None:
+    if mode == "delete":
+        path.unlink(missing_ok=True)
+    elif mode == "quarantine":
+        target = QUARANTINE_DIR / path.relative_to(uploads.PUBLIC_DIR)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(path, target)
+    # Пустые подкаталоги ab/ не удаляются: в них может как раз сохраняться новая загрузка
+
+
+def process_batch(check, batch, mode: str, cutoff: float, show: bool) -> tuple:
+    urls = [url for url, _ in batch]
+    owners = [owner for owner in map(owner_url, urls) if owner]
+    referenced = set(check.scalars(text(STILL_REFERENCED), {"urls": urls, "owners": owners}))
+    count = size = 0
+    for url, file_size in batch:
+        path = uploads.path_for(url)
+        if path is None:
+            continue
+        try:
+            if url in referenced or owner_url(url) in referenced or path.stat().st_mtime >= cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        if show:
+            print(f"  {url}  {file_size} Б")
+        if mode != "report":
+            dispose(path, mode)
+        count += 1
+        size += file_size
+    return count, size
+
+
+def collect(mode: str, grace_hours: float, show: bool) -> None:
+    started = time.perf_counter()
+    cutoff = time.time() - grace_hours * 3600
+    reader = FilesReader(UPLOAD_DIRS)
+    count = size = 0
+    with engine.connect() as conn, engine.connect() as check:
+        conn.execute(text(
+            "CREATE TEMP TABLE gc_files (url text PRIMARY KEY, owner text, size bigint, mtime double precision)"
+            " ON COMMIT DROP"
+        ))
+        cursor = conn.connection.dbapi_connection.cursor()
+        cursor.copy_expert("COPY gc_files (url, owner, size, mtime) FROM STDIN", reader)
+        conn.execute(text("ANALYZE gc_files"))
+
+        orphans = conn.execution_options(stream_results=True, yield_per=BATCH_SIZE).execute(
+            text(ORPHANS), {"cutoff": cutoff}
+        )
+        for batch in orphans.partitions():
+            batch_count, batch_size = process_batch(check, batch, mode, cutoff, show)
+            count += batch_count
+            size += batch_size
+        conn.rollback()
+
+    action = {"report": "можно удалить", "quarantine": f"перенесено в {QUARANTINE_DIR}", "delete": "удалено"}[mode]
+    print(f"Файлов просмотрено: {reader.files}; {action}: {count} ({size / 1024 / 1024:.1f} МБ) "
+          f"за {time.perf_counter() - started:.1f} с")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сборщик неиспользуемых файлов фото")
+    parser.add_argument("--mode", choices=["report", "quarantine", "delete"], default="report")
+    parser.add_argument("--grace-hours", type=float, default=GRACE_HOURS,
+                        help="не трогать файлы моложе стольких часов")
+    parser.add_argument("--list", action="store_true", help="вывести каждый найденный файл")
+    args = parser.parse_args(argv)
+    collect(args.mode, args.grace_hours, args.list)
+
+
+if __name__ == "__main__":
+    main()
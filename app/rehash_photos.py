@@ -0,0 +1,112 @@
+"""
+Переносит фото со старыми именами (1_photo.jpg) в хранилище по хешу содержимого:
+
+    python -m app.rehash_photos --dry-run    # только отчёт
+    python -m app.rehash_photos
+
+Одинаковые файлы становятся одним, photos.image_url переписывается. Новый файл —
+жёсткая ссылка на старый (копия, если ссылки не поддерживаются), сам старый файл
+остаётся на месте, пока его не уберёт сборщик неиспользуемых фото. Копии для srcset
+после переноса делает python -m app.backfill_image_variants.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import shutil
+import uuid
+
+from sqlalchemy import bindparam, select
+
+from app import database, models
+from app.services import catalog, uploads
+from app.static_files import CONTENT_ADDRESSED_NAME
+
+
+BATCH_SIZE = 500
+
+
+def digest_of(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(uploads.UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_existing(path, dry_run: bool):
+    """Путь по хешу для существующего файла; True вторым значением — такой файл уже был."""
+    target = uploads.content_path(path.parent, digest_of(path), uploads.extension(path.name))
+    if target.exists():
+        if not dry_run:
+            os.utime(target)
+        return target, True
+    if not dry_run:
+        target.parent.mkdir(exist_ok=True)
+        tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            os.link(path, tmp)
+        except OSError:
+            shutil.copy2(path, tmp)
+        os.utime(tmp)
+        os.replace(tmp, target)
+    return target, False
+
+
+async def rehash(dry_run: bool) -> None:
+    photos = models.Photo.__table__
+    moved = merged = missing = 0
+    renames = {}
+    stored = set()
+    async with database.AsyncSessionLocal() as db:
+        urls = await db.stream_scalars(select(models.Photo.image_url).distinct())
+        async for url in urls:
+            if not url.startswith("/img/") or CONTENT_ADDRESSED_NAME.match(os.path.basename(url)):
+                continue
+            path = uploads.path_for(url)
+            if path is None or not path.is_file():
+                missing += 1
+                continue
+            target, existed = await asyncio.to_thread(store_existing, path, dry_run)
+            # В пробном прогоне файлы не создаются — совпадения внутри прогона считаем сами
+            existed = existed or target in stored
+            stored.add(target)
+            renames[url] = uploads.url_for(target)
+            merged += existed
+            moved += not existed
+
+    print(f"Старых имён: {len(renames)}, новых файлов: {moved}, совпали с уже сохранёнными: {merged}, "
+          f"нет на диске: {missing}")
+    if dry_run or not renames:
+        return
+
+    update = (
+        photos.update()
+        .where(photos.c.image_url == bindparam("old_url"))
+        .values(image_url=bindparam("new_url"), variants=None)
+    )
+    items = list(renames.items())
+    async with database.AsyncSessionLocal() as db:
+        for i in range(0, len(items), BATCH_SIZE):
+            await db.execute(update, [{"old_url": old, "new_url": new} for old, new in items[i:i + BATCH_SIZE]])
+        await db.commit()
+    await catalog.invalidate(None)
+    print("Ссылки обновлены; запустите python -m app.backfill_image_variants")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Перенос фото в хранилище по хешу содержимого")
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать, ничего не менять")
+    args = parser.parse_args(argv)
+
+    async def run():
+        try:
+            await rehash(args.dry_run)
+        finally:
+            await database.async_engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
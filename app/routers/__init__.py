@@ -3,6 +3,7 @@ from app.routers.baths import router as baths_router
 from app.routers.bookings import router as bookings_router
 from app.routers.admin_auth import router as auth_router
 from app.routers.admin_reservations import router as reservations
+from app.routers.admin_events import router as events_router
 from app.routers.reservation_status import router as reservations_status
 from app.routers.partner.partner import router as partner_router
 from app.routers.clients.client import router as client_router
@@ -23,6 +24,7 @@ api_router.include_router(baths_router)
 api_router.include_router(bookings_router)
 api_router.include_router(reservations)
 api_router.include_router(reservations_status)
+api_router.include_router(events_router)
 
 api_router.include_router(partner_router)
 api_router.include_router(client_router)
@@ -1,20 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Form
+import math
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Form
 from fastapi.security import OAuth2PasswordRequestForm  
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas, security, auth, database
+from app.services import login_throttle, user_cache
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 @router.post("/login", response_model=dict)
-def login(
+async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),  
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_db)
 ):
     username = form_data.username
     password = form_data.password
+    ip = request.client.host if request.client else "unknown"
+
+    # Перебор отсекается до запроса в БД и до bcrypt; попытка считается неудачной, пока вход не удался
+    retry_after, attempt = await login_throttle.begin(username, ip)
+    if attempt is None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Слишком много попыток входа, попробуйте позже",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
 
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user = await db.scalar(select(models.User).where(models.User.username == username))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -27,12 +42,19 @@ def login(
             detail="Аккаунт деактивирован"
         )
 
-    if not security.verify_password(password, user.password_hash):
+    try:
+        valid = await security.verify_password_async(password, user.password_hash)
+    except HTTPException:
+        # Пул хеширования переполнен — пароль не проверялся
+        await login_throttle.cancel(attempt)
+        raise
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный логин или пароль"
         )
 
+    await login_throttle.succeed(attempt)
     access_token = auth.create_access_token(data={"sub": str(user.user_id)})
 
     return {
@@ -41,5 +63,5 @@ def login(
     }
 
 @router.get("/me", response_model=schemas.UserResponse)
-def get_current_user_info(current_user: models.User = Depends(auth.get_current_user)):
+async def get_current_user_info(current_user: user_cache.CachedUser = Depends(auth.get_current_user)):
     return current_user
\ No newline at end of file
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from app.auth import get_stream_user
+from app.services import events, user_cache
+
+router = APIRouter(prefix="/admin/events", tags=["events"])
+
+HEARTBEAT_SECONDS = 15
+
+
+def format_event(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@router.get("/")
+async def stream_events(
+    request: Request,
+    current_user: user_cache.CachedUser = Depends(get_stream_user)
+):
+    """
+    Server-Sent Events: reservation.created / updated / deleted, booking.created / updated, baths.changed
+    и categories.changed.
+    Если клиент отстал и события потерялись, приходит resync — нужно перечитать список.
+    """
+    subscription = events.broker.subscribe()
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    yield "event: resync\ndata: {}\n\n"
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_event(event)
+        finally:
+            events.broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,9 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import DateTime, cast, delete, func, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 from typing import List
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
+import os
 from app import models, schemas, database
 from app.auth import get_current_user
+from app.pagination import NEXT_CURSOR_HEADER, cursor_datetime, cursor_int, decode_cursor, encode_cursor
+from app.services import availability, events, pricing, stock, user_cache
 
 
 router = APIRouter(
@@ -11,34 +18,83 @@ router = APIRouter(
     tags=["reservations"]
 )
 
+RESERVATIONS_PAGE_SIZE = int(os.getenv("RESERVATIONS_PAGE_SIZE", "200"))
+RESERVATIONS_MAX_PAGE_SIZE = int(os.getenv("RESERVATIONS_MAX_PAGE_SIZE", "1000"))
+MAX_QUOTE_ITEMS = 1000
+MAX_BOOKING_CONVERSIONS = int(os.getenv("MAX_BOOKING_CONVERSIONS", "200"))
 
-def check_overlap(db: Session, bath_id: int, start: datetime, end: datetime, exclude_id: int = None):
+
+async def check_overlap(db: AsyncSession, bath_id: int, start: datetime, end: datetime, exclude_id: int = None):
     """
     Проверяет пересечение с существующими бронями, включая 30-минутную уборку после каждой.
-    Уборка = end_datetime + 30 минут.
+    Уборка = end_datetime + 30 минут, и у новой брони тоже — так же считает
+    ограничение reservations_no_overlap в БД.
+    Время передаётся как timestamptz, как и при записи брони: иначе наивное время БД
+    прочла бы в своём часовом поясе, а не в поясе приложения (см. availability.overlaps).
     """
-    query = db.query(models.Reservation).filter(
+    query = select(models.Reservation).where(
         models.Reservation.bath_id == bath_id,
-        models.Reservation.start_datetime < end,
-        (models.Reservation.end_datetime + timedelta(minutes=30)) > start
+        models.Reservation.busy_range.op("&&")(func.reservation_busy_range(
+            cast(start, DateTime(timezone=True)), cast(end, DateTime(timezone=True))
+        ))
     )
     if exclude_id:
-        query = query.filter(models.Reservation.reservation_id != exclude_id)
-    return query.first()
+        query = query.where(models.Reservation.reservation_id != exclude_id)
+    return (await db.scalars(query.limit(1))).first()
+
+
+@asynccontextmanager
+async def overlap_guard(db: AsyncSession):
+    """
+    check_overlap не защищает от параллельных запросов, окончательно пересечение
+    отсекает ограничение в БД — превращаем его в ту же ошибку 400.
+    """
+    try:
+        yield
+    except IntegrityError as e:
+        await db.rollback()
+        if availability.is_overlap_violation(e):
+            raise HTTPException(status_code=400, detail="Бронь пересекается с существующей")
+        raise
+
+
+def product_lines(products: dict, quantities: dict) -> List[schemas.ReservationProductResponse]:
+    """Товары брони для ответа — из уже загруженных строк, без повторных запросов."""
+    return [
+        schemas.ReservationProductResponse(
+            product_id=product_id,
+            name=products[product_id].name,
+            quantity=quantity,
+            purchase_price=products[product_id].last_purchase_price
+        )
+        for product_id, quantity in quantities.items()
+    ]
 
 
 @router.get("/", response_model=List[schemas.ReservationResponse])
-def get_reservations(
+async def get_reservations(
+    response: Response,
     date: str = None, 
+    date_from: str = Query(None, alias="from"),
+    date_to: str = Query(None, alias="to"),
     bath_id: int = None,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(get_current_user)
+    status_id: int = None,
+    cursor: str = None,
+    limit: int = Query(RESERVATIONS_PAGE_SIZE, ge=1, le=RESERVATIONS_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(database.get_db),
+    current_user: user_cache.CachedUser = Depends(get_current_user)
 ):
-    query = db.query(models.Reservation).options(
+    """
+    Брони, пересекающиеся с периодом [from, to) (или с сутками date), по возрастанию
+    (start_datetime, reservation_id). Если есть следующая страница, её курсор
+    возвращается в заголовке X-Next-Cursor.
+    """
+    query = select(models.Reservation).options(
         joinedload(models.Reservation.status_rel),
-        joinedload(models.Reservation.reservation_products).joinedload(models.ReservationProduct.product)
+        selectinload(models.Reservation.reservation_products).joinedload(models.ReservationProduct.product)
     )
 
+    period_start = period_end = None
     if date is not None:
         try:
             if "T" in date:
@@ -48,18 +104,45 @@ def get_reservations(
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
-        start_of_day = datetime.combine(target_date, datetime.min.time())
-        end_of_day = datetime.combine(target_date, datetime.max.time())
+        period_start = datetime.combine(target_date, datetime.min.time())
+        period_end = period_start + timedelta(days=1)
 
-        query = query.filter(
-            models.Reservation.start_datetime >= start_of_day,
-            models.Reservation.end_datetime <= end_of_day
-        )
+    try:
+        if date_from is not None:
+            period_start = datetime.fromisoformat(date_from)
+        if date_to is not None:
+            period_end = datetime.fromisoformat(date_to)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use ISO: YYYY-MM-DDTHH:MM:SS")
+
+    # Бронь попадает в период, если хотя бы частично с ним пересекается
+    if period_start is not None:
+        query = query.where(models.Reservation.end_datetime > period_start)
+    if period_end is not None:
+        query = query.where(models.Reservation.start_datetime < period_end)
 
     if bath_id is not None:
-        query = query.filter(models.Reservation.bath_id == bath_id)
+        query = query.where(models.Reservation.bath_id == bath_id)
+    if status_id is not None:
+        query = query.where(models.Reservation.status_id == status_id)
+
+    if cursor is not None:
+        after_start, after_id = decode_cursor(cursor, 2)
+        query = query.where(
+            tuple_(models.Reservation.start_datetime, models.Reservation.reservation_id)
+            > tuple_(cursor_datetime(after_start), cursor_int(after_id))
+        )
+
+    reservations = (await db.scalars(
+        query
+        .order_by(models.Reservation.start_datetime, models.Reservation.reservation_id)
+        .limit(limit + 1)
+    )).all()
 
-    reservations = query.all()
+    if len(reservations) > limit:
+        reservations = reservations[:limit]
+        last = reservations[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.start_datetime, last.reservation_id)
 
     for res in reservations:
         # Товары — только если объект существует
@@ -80,19 +163,181 @@ def get_reservations(
     return reservations
 
 
+@router.post("/quote", response_model=List[schemas.ReservationQuote])
+async def quote_reservations(
+    request: schemas.ReservationQuoteRequest,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: user_cache.CachedUser = Depends(get_current_user)
+):
+    """
+    Стоимость множества вариантов брони (баня, время, гости, товары) без создания броней —
+    например, для сетки цен на весь день. Наличие времени и товаров не проверяется.
+    """
+    if len(request.items) > MAX_QUOTE_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Не больше {MAX_QUOTE_ITEMS} вариантов за запрос")
+
+    lines = []
+    for item in request.items:
+        try:
+            start_dt = datetime.fromisoformat(item.start_datetime)
+            end_dt = datetime.fromisoformat(item.end_datetime)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Неверный формат даты. Используйте ISO: YYYY-MM-DDTHH:MM:SS")
+        if start_dt >= end_dt:
+            raise HTTPException(status_code=400, detail="Время окончания должно быть позже начала")
+        lines.append(pricing.QuoteLine(item.bath_id, start_dt, end_dt, item.guests, stock.merge_items(item.products)))
+
+    prices = await pricing.quote_many(db, lines)
+
+    return [
+        schemas.ReservationQuote(
+            bath_id=line.bath_id,
+            start_datetime=line.start,
+            end_datetime=line.end,
+            guests=line.guests,
+            **price._asdict()
+        )
+        for line, price in zip(lines, prices)
+    ]
+
+
+@router.post("/from-bookings", response_model=List[schemas.BookingConversionResult])
+async def convert_bookings(
+    request: schemas.BookingConversionRequest,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: user_cache.CachedUser = Depends(get_current_user)
+):
+    """
+    Брони из заявок с сайта пакетом: время выбирает администратор, остальное берётся из заявки.
+    Пересечения проверяются по индексу занятости каждой бани — и с существующими бронями,
+    и между заявками пакета (раньше по времени — раньше в очереди). Все брони создаются
+    одной транзакцией, заявки помечаются прочитанными. Результат — по каждой заявке.
+    """
+    if len(request.items) > MAX_BOOKING_CONVERSIONS:
+        raise HTTPException(status_code=400, detail=f"Не больше {MAX_BOOKING_CONVERSIONS} заявок за запрос")
+
+    status_obj = await db.get(models.ReservationStatus, request.status_id)
+    if not status_obj:
+        raise HTTPException(status_code=400, detail=f"Статус с ID {request.status_id} не найден")
+
+    bookings = {
+        booking.booking_id: booking
+        for booking in await db.scalars(
+            select(models.Booking).where(models.Booking.booking_id.in_({item.booking_id for item in request.items}))
+        )
+    }
+
+    results = [schemas.BookingConversionResult(booking_id=item.booking_id, result="invalid") for item in request.items]
+    candidates = []
+    seen = set()
+    for i, item in enumerate(request.items):
+        result = results[i]
+        booking = bookings.get(item.booking_id)
+        if booking is None:
+            result.result, result.detail = "not_found", "Заявка не найдена"
+            continue
+        if item.booking_id in seen:
+            result.detail = "Заявка указана в пакете повторно"
+            continue
+        seen.add(item.booking_id)
+        try:
+            start_dt = datetime.fromisoformat(item.start_datetime)
+            end_dt = (datetime.fromisoformat(item.end_datetime) if item.end_datetime
+                      else start_dt + timedelta(hours=booking.duration_hours))
+        except ValueError:
+            result.detail = "Неверный формат даты. Используйте ISO: YYYY-MM-DDTHH:MM:SS"
+            continue
+        if start_dt >= end_dt:
+            result.detail = "Время окончания должно быть позже начала"
+            continue
+        result.bath_id, result.start_datetime, result.end_datetime = item.bath_id or booking.bath_id, start_dt, end_dt
+        candidates.append(i)
+
+    tariffs = await pricing.load_tariffs(db, (results[i].bath_id for i in candidates))
+    by_bath = {}
+    for i in candidates:
+        if results[i].bath_id not in tariffs:
+            results[i].result, results[i].detail = "not_found", "Баня не найдена"
+        else:
+            by_bath.setdefault(results[i].bath_id, []).append(i)
+
+    # Один проход по каждой бане: заявки по времени начала, принятые сразу занимают время
+    accepted = []
+    for bath_id, indices in by_bath.items():
+        local = {i: (availability.to_local(results[i].start_datetime), availability.to_local(results[i].end_datetime))
+                 for i in indices}
+        indices.sort(key=lambda i: local[i])
+        window_start = min(start for start, _ in local.values())
+        window_end = max(end for _, end in local.values()) + availability.CLEANING_BUFFER
+        existing = await availability.load_index(db, bath_id, window_start, window_end, fresh=True)
+        batch = availability.BathIntervalIndex(bath_id, existing.window_start, existing.window_end, [])
+        for i in indices:
+            start, end = local[i][0], local[i][1] + availability.CLEANING_BUFFER
+            if existing.conflicts(start, end):
+                results[i].result, results[i].detail = "conflict", "Бронь пересекается с существующей"
+            elif batch.conflicts(start, end):
+                results[i].result, results[i].detail = "conflict", "Пересекается с другой заявкой пакета"
+            else:
+                batch.add(start, end)
+                accepted.append(i)
+    accepted.sort()
+
+    if not accepted:
+        return results
+
+    lines = [
+        pricing.QuoteLine(results[i].bath_id, results[i].start_datetime, results[i].end_datetime,
+                          bookings[request.items[i].booking_id].guests, {})
+        for i in accepted
+    ]
+    # Тарифы уже прочитаны при проверке бань
+    prices = await pricing.quote_many(db, lines, tariffs)
+
+    reservations = []
+    for i, price in zip(accepted, prices):
+        booking = bookings[request.items[i].booking_id]
+        reservations.append(models.Reservation(
+            bath_id=results[i].bath_id,
+            start_datetime=results[i].start_datetime,
+            end_datetime=results[i].end_datetime,
+            client_name=booking.name,
+            client_phone=booking.phone,
+            client_email=booking.email,
+            notes=booking.notes,
+            guests=booking.guests,
+            total_cost=price.total_cost,
+            status_id=request.status_id,
+        ))
+        booking.is_read = True
+    db.add_all(reservations)
+    # Параллельная бронь могла занять время после чтения индексов — тогда откатывается весь пакет
+    async with overlap_guard(db):
+        await db.flush()
+    await db.commit()
+
+    availability.invalidate(*by_bath)
+    for i, reservation in zip(accepted, reservations):
+        results[i].result = "created"
+        results[i].reservation_id = reservation.reservation_id
+        results[i].total_cost = reservation.total_cost
+        await events.publish(events.reservation_event("reservation.created", reservation))
+        await events.publish(events.booking_event("booking.updated", bookings[request.items[i].booking_id]))
+    return results
+
+
 @router.post("/", response_model=schemas.ReservationResponse, status_code=status.HTTP_201_CREATED)
-def create_reservation(
+async def create_reservation(
     reservation: schemas.ReservationCreate,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(database.get_db),
+    current_user: user_cache.CachedUser = Depends(get_current_user)
 ):
     # 1. Проверяем, существует ли баня
-    bath = db.query(models.Bath).filter(models.Bath.bath_id == reservation.bath_id).first()
+    bath = await db.get(models.Bath, reservation.bath_id)
     if not bath:
         raise HTTPException(status_code=404, detail="Баня не найдена")
 
     # 2. Проверяем, существует ли статус
-    status_obj = db.query(models.ReservationStatus).filter(models.ReservationStatus.id == reservation.status_id).first()
+    status_obj = await db.get(models.ReservationStatus, reservation.status_id)
     if not status_obj:
         raise HTTPException(status_code=400, detail=f"Статус с ID {reservation.status_id} не найден")
 
@@ -107,32 +352,15 @@ def create_reservation(
         raise HTTPException(status_code=400, detail="Время окончания должно быть позже начала")
 
     # 4. Проверяем пересечения
-    overlap = check_overlap(db, reservation.bath_id, start_dt, end_dt)
+    overlap = await check_overlap(db, reservation.bath_id, start_dt, end_dt)
     if overlap:
         raise HTTPException(status_code=400, detail="Бронь пересекается с существующей")
 
-    # 5. Рассчитываем общую стоимость
-    total_cost = 0
-
-    # 5.1 Стоимость бани + гости
-    duration_hours = (end_dt - start_dt).total_seconds() / 3600
-    bath_base_cost = int(bath.cost * duration_hours)
-    extra_guests = max(0, reservation.guests - bath.base_guests)
-    extra_guest_cost = extra_guests * bath.extra_guest_price
-    total_cost += bath_base_cost + extra_guest_cost
-
-    # 5.2 Стоимость товаров
-    if reservation.products:
-        product_ids = [p.product_id for p in reservation.products]
-        products = db.query(models.Product).filter(models.Product.id.in_(product_ids)).all()
-        product_map = {p.id: p for p in products}
-        for item in reservation.products:
-            product = product_map.get(item.product_id)
-            if not product:
-                raise HTTPException(status_code=400, detail=f"Товар с ID {item.product_id} не найден")
-            if product.total_quantity < item.quantity:
-                raise HTTPException(status_code=400, detail=f"Недостаточно товара {product.name} на складе")
-            total_cost += product.last_purchase_price * item.quantity
+    # 5. Рассчитываем общую стоимость — все товары читаем и блокируем одним запросом
+    quantities = stock.merge_items(reservation.products)
+    products = await stock.lock_products(db, quantities)
+    stock.require_products(products, quantities)
+    total_cost = pricing.price_reservation(bath, start_dt, end_dt, reservation.guests, products, quantities).total_cost
 
     # 6. Создаём бронь
     db_reservation = models.Reservation(
@@ -148,40 +376,26 @@ def create_reservation(
         status_id=reservation.status_id,
     )
     db.add(db_reservation)
-    db.flush()
-
-    # 7. Сохраняем товары и списываем со склада
-    if reservation.products:
-        for item in reservation.products:
-            product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-            if not product:
-                raise HTTPException(status_code=400, detail=f"Товар с ID {item.product_id} не найден")
-            if product.total_quantity < item.quantity:
-                raise HTTPException(status_code=400, detail=f"Недостаточно товара {product.name} на складе")
-            product.total_quantity -= item.quantity
-            db.add(models.ReservationProduct(
-                reservation_id=db_reservation.reservation_id,
-                product_id=item.product_id,
-                quantity=item.quantity
-            ))
-
-    db.commit()
-    db.refresh(db_reservation)
-
-    # === ФОРМИРУЕМ ОТВЕТ ВРУЧНУЮ ===
-    response_products = []
-    if reservation.products:
-        for item in reservation.products:
-            product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-            if product:
-                response_products.append(
-                    schemas.ReservationProductResponse(
-                        product_id=product.id,
-                        name=product.name,
-                        quantity=item.quantity,
-                        purchase_price=product.last_purchase_price
-                    )
-                )
+    async with overlap_guard(db):
+        await db.flush()
+
+    # 7. Списываем со склада и сохраняем товары
+    await stock.apply_stock_changes(db, products, {pid: -qty for pid, qty in quantities.items()},
+                                    stock.RESERVATION, reservation_id=db_reservation.reservation_id)
+    db.add_all([
+        models.ReservationProduct(
+            reservation_id=db_reservation.reservation_id,
+            product_id=product_id,
+            quantity=quantity
+        )
+        for product_id, quantity in quantities.items()
+    ])
+    response_products = product_lines(products, quantities)
+
+    await db.commit()
+    await db.refresh(db_reservation)
+    availability.invalidate(db_reservation.bath_id)
+    await events.publish(events.reservation_event("reservation.created", db_reservation))
 
     return schemas.ReservationResponse(
         reservation_id=db_reservation.reservation_id,
@@ -201,18 +415,19 @@ def create_reservation(
 
 
 @router.get("/{id}", response_model=schemas.ReservationResponse)
-def get_reservation(
+async def get_reservation(
     id: int,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(database.get_db),
+    current_user: user_cache.CachedUser = Depends(get_current_user)
 ):
-    reservation = db.query(models.Reservation)\
+    reservation = await db.scalar(
+        select(models.Reservation)
         .options(
             joinedload(models.Reservation.status_rel),
-            joinedload(models.Reservation.reservation_products).joinedload(models.ReservationProduct.product)
-        )\
-        .filter(models.Reservation.reservation_id == id)\
-        .first()
+            selectinload(models.Reservation.reservation_products).joinedload(models.ReservationProduct.product)
+        )
+        .where(models.Reservation.reservation_id == id)
+    )
     
     if not reservation:
         raise HTTPException(status_code=404, detail="Бронь не найдена")
@@ -232,22 +447,24 @@ def get_reservation(
 
 
 @router.put("/{id}", response_model=schemas.ReservationResponse)
-def update_reservation(
+async def update_reservation(
     id: int,
     reservation: schemas.ReservationUpdate,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(database.get_db),
+    current_user: user_cache.CachedUser = Depends(get_current_user)
 ):
-    db_reservation = db.query(models.Reservation).filter(models.Reservation.reservation_id == id).first()
+    db_reservation = await db.get(models.Reservation, id)
     if not db_reservation:
         raise HTTPException(status_code=404, detail="Бронь не найдена")
+    old_bath_id = db_reservation.bath_id
 
-    # === ВОЗВРАТ СТАРЫХ ТОВАРОВ НА СКЛАД ===
-    old_products = db.query(models.ReservationProduct).filter(models.ReservationProduct.reservation_id == id).all()
-    for old_rp in old_products:
-        product = db.query(models.Product).filter(models.Product.id == old_rp.product_id).first()
-        if product:
-            product.total_quantity += old_rp.quantity
+    # === СТАРЫЕ И НОВЫЕ ТОВАРЫ: блокируем все строки одним запросом ===
+    old_quantities = stock.merge_items((await db.scalars(
+        select(models.ReservationProduct).where(models.ReservationProduct.reservation_id == id)
+    )).all())
+    quantities = stock.merge_items(reservation.products)
+    products = await stock.lock_products(db, set(old_quantities) | set(quantities))
+    stock.require_products(products, quantities)
 
     # Обновляем основные поля
     update_data = reservation.model_dump(
@@ -265,7 +482,7 @@ def update_reservation(
     # Обработка status_id
     status_obj = None
     if reservation.status_id is not None:
-        status_obj = db.query(models.ReservationStatus).filter(models.ReservationStatus.id == reservation.status_id).first()
+        status_obj = await db.get(models.ReservationStatus, reservation.status_id)
         if not status_obj:
             raise HTTPException(status_code=400, detail=f"Статус с ID {reservation.status_id} не найден")
         db_reservation.status_id = reservation.status_id
@@ -289,7 +506,7 @@ def update_reservation(
         raise HTTPException(status_code=400, detail="Время окончания должно быть позже начала")
 
     # Проверка пересечений
-    overlap = check_overlap(db, db_reservation.bath_id, start_dt, end_dt, exclude_id=id)
+    overlap = await check_overlap(db, db_reservation.bath_id, start_dt, end_dt, exclude_id=id)
     if overlap:
         raise HTTPException(status_code=400, detail="Бронь пересекается с существующей")
 
@@ -297,70 +514,39 @@ def update_reservation(
     db_reservation.end_datetime = end_dt
 
     # Пересчёт стоимости
-    bath = db.query(models.Bath).filter(models.Bath.bath_id == db_reservation.bath_id).first()
+    bath = await db.get(models.Bath, db_reservation.bath_id)
     if not bath:
         raise HTTPException(status_code=500, detail="Баня, связанная с бронью, не найдена")
 
-    duration_hours = (end_dt - start_dt).total_seconds() / 3600
-    bath_base_cost = int(bath.cost * duration_hours)
-    extra_guests = max(0, current_guests - bath.base_guests)
-    extra_guest_cost = extra_guests * bath.extra_guest_price
-    total_cost = bath_base_cost + extra_guest_cost
-
-    # Стоимость товаров
-    if reservation.products:
-        product_ids = [p.product_id for p in reservation.products]
-        products = db.query(models.Product).filter(models.Product.id.in_(product_ids)).all()
-        product_map = {p.id: p for p in products}
-        for item in reservation.products:
-            product = product_map.get(item.product_id)
-            if not product:
-                raise HTTPException(status_code=400, detail=f"Товар с ID {item.product_id} не найден")
-            if product.total_quantity < item.quantity:
-                raise HTTPException(status_code=400, detail=f"Недостаточно товара {product.name} на складе")
-            total_cost += product.last_purchase_price * item.quantity
-
-    db_reservation.total_cost = total_cost
-
-    # Удаляем старые связи (только товары)
-    db.query(models.ReservationProduct).filter(models.ReservationProduct.reservation_id == id).delete()
-
-    # Добавляем новые товары и списываем их
-    if reservation.products:
-        for item in reservation.products:
-            product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-            if not product:
-                raise HTTPException(status_code=400, detail=f"Товар с ID {item.product_id} не найден")
-            if product.total_quantity < item.quantity:
-                raise HTTPException(status_code=400, detail=f"Недостаточно товара {product.name} на складе")
-            product.total_quantity -= item.quantity
-            db.add(models.ReservationProduct(
-                reservation_id=id,
-                product_id=item.product_id,
-                quantity=item.quantity
-            ))
-
-    db.commit()
-    db.refresh(db_reservation)
-
-    # === ФОРМИРУЕМ ОТВЕТ ВРУЧНУЮ ===
-    response_products = []
-    if reservation.products:
-        for item in reservation.products:
-            product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-            if product:
-                response_products.append(
-                    schemas.ReservationProductResponse(
-                        product_id=product.id,
-                        name=product.name,
-                        quantity=item.quantity,
-                        purchase_price=product.last_purchase_price
-                    )
-                )
-
-    status_name = (status_obj or db.query(models.ReservationStatus)
-                   .filter(models.ReservationStatus.id == db_reservation.status_id)
-                   .first()).status_name
+    db_reservation.total_cost = pricing.price_reservation(
+        bath, start_dt, end_dt, current_guests, products, quantities
+    ).total_cost
+
+    # Возврат старых и списание новых товаров — один UPDATE
+    deltas = dict(old_quantities)
+    for product_id, quantity in quantities.items():
+        deltas[product_id] = deltas.get(product_id, 0) - quantity
+    await stock.apply_stock_changes(db, products, deltas, stock.RESERVATION, reservation_id=id)
+
+    # Заменяем связи (только товары)
+    await db.execute(delete(models.ReservationProduct).where(models.ReservationProduct.reservation_id == id))
+    db.add_all([
+        models.ReservationProduct(
+            reservation_id=id,
+            product_id=product_id,
+            quantity=quantity
+        )
+        for product_id, quantity in quantities.items()
+    ])
+    response_products = product_lines(products, quantities)
+
+    async with overlap_guard(db):
+        await db.commit()
+    await db.refresh(db_reservation)
+    availability.invalidate(old_bath_id, db_reservation.bath_id)
+    await events.publish(events.reservation_event("reservation.updated", db_reservation, previous_bath_id=old_bath_id))
+
+    status_name = (status_obj or await db.get(models.ReservationStatus, db_reservation.status_id)).status_name
 
     return schemas.ReservationResponse(
         reservation_id=db_reservation.reservation_id,
@@ -380,23 +566,27 @@ def update_reservation(
 
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_reservation(
+async def delete_reservation(
     id: int,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(database.get_db),
+    current_user: user_cache.CachedUser = Depends(get_current_user)
 ):
-    reservation = db.query(models.Reservation).filter(models.Reservation.reservation_id == id).first()
+    reservation = await db.get(
+        models.Reservation, id, options=[selectinload(models.Reservation.reservation_products)]
+    )
     if not reservation:
         raise HTTPException(status_code=404, detail="Бронь не найдена")
 
     # === ВОЗВРАТ ТОВАРОВ НА СКЛАД ДО УДАЛЕНИЯ ===
-    for rp in reservation.reservation_products:
-        product = db.query(models.Product).filter(models.Product.id == rp.product_id).first()
-        if product:
-            product.total_quantity += rp.quantity
+    quantities = stock.merge_items(reservation.reservation_products)
+    products = await stock.lock_products(db, quantities)
+    await stock.apply_stock_changes(db, products, quantities, stock.RESERVATION, reservation_id=reservation.reservation_id)
 
     # Теперь можно безопасно удалить
-    db.delete(reservation)
-    db.commit()
+    deleted_event = events.reservation_event("reservation.deleted", reservation)
+    await db.delete(reservation)
+    await db.commit()
+    availability.invalidate(deleted_event["bath_id"])
+    await events.publish(deleted_event)
 
     return None
\ No newline at end of file
@@ -1,71 +1,103 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Query, Request
+from pydantic import TypeAdapter
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional
+from datetime import datetime, timedelta
 import os
 from pathlib import Path
 from app.database import get_db
 from app.models import Bath, Photo, BathFeature
-from app.schemas import BathOut, BathCreate, BathUpdate
+from app.schemas import BathOut, BathCreate, BathUpdate, BathAvailability
+from app.services import availability, catalog, images, uploads
 
 router = APIRouter(prefix="/baths", tags=["baths"])
 
+MAX_AVAILABILITY_RANGE = timedelta(days=62)
 
-@router.get("/")
-def get_baths(db: Session = Depends(get_db)):
 
-    baths = db.query(Bath)\
-        .options(joinedload(Bath.photos))\
-        .options(joinedload(Bath.features))\
-        .all()
+def bath_query():
+    # Всё, что отдаёт BathOut, грузим сразу: ленивой подгрузки в async-сессии нет
+    return select(Bath).options(selectinload(Bath.photos), selectinload(Bath.features))
 
-    if not baths:
-        return []
 
-    return baths
+async def load_bath(db: AsyncSession, bath_id: int) -> Optional[Bath]:
+    # populate_existing — чтобы после записи перечитать коллекции уже загруженного объекта
+    return await db.scalar(
+        bath_query().where(Bath.bath_id == bath_id).execution_options(populate_existing=True)
+    )
+
+
+BATH_LIST_ADAPTER = TypeAdapter(List[BathOut])
+
+
+@router.get("/", response_model=List[BathOut])
+async def get_baths(request: Request, db: AsyncSession = Depends(get_db)):
 
+    async def load():
+        baths = (await db.scalars(bath_query().order_by(Bath.bath_id))).all()
+        return BATH_LIST_ADAPTER.dump_json(BATH_LIST_ADAPTER.validate_python(baths, from_attributes=True))
 
-@router.get("/{bath_id}")
-def get_bath(bath_id: int, db: Session = Depends(get_db)):
-    bath = db.query(Bath)\
-        .options(joinedload(Bath.photos))\
-        .options(joinedload(Bath.features))\
-        .filter(Bath.bath_id == bath_id)\
-        .first()
+    return catalog.cached_json(request, await catalog.get_or_load("list", load))
 
+
+@router.get("/{bath_id}", response_model=BathOut)
+async def get_bath(bath_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+
+    async def load():
+        bath = await db.scalar(bath_query().where(Bath.bath_id == bath_id))
+        return BathOut.model_validate(bath).model_dump_json().encode() if bath else None
+
+    entry = await catalog.get_or_load(bath_id, load)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Баня не найдена")
+
+    return catalog.cached_json(request, entry)
+
+@router.get("/{bath_id}/availability", response_model=BathAvailability)
+async def get_bath_availability(
+    bath_id: int,
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    duration: float = Query(..., gt=0, description="Длительность брони в часах"),
+    step: int = Query(30, gt=0, le=24 * 60, description="Шаг сетки в минутах"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Все свободные начала брони на заданную длительность в диапазоне [from, to).
+    Учитывается 30-минутная уборка после каждой брони.
+    """
+    try:
+        start = datetime.fromisoformat(date_from)
+        end = datetime.fromisoformat(date_to)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Неверный формат даты. Используйте ISO: YYYY-MM-DDTHH:MM:SS")
+
+    if (start.tzinfo is None) != (end.tzinfo is None):
+        raise HTTPException(status_code=400, detail="Даты from и to должны быть в одном формате")
+    if start >= end:
+        raise HTTPException(status_code=400, detail="Дата to должна быть позже from")
+    if end - start > MAX_AVAILABILITY_RANGE:
+        raise HTTPException(status_code=400, detail=f"Диапазон не может превышать {MAX_AVAILABILITY_RANGE.days} дней")
+
+    bath = await db.scalar(select(Bath.bath_id).where(Bath.bath_id == bath_id))
     if not bath:
         raise HTTPException(status_code=404, detail="Баня не найдена")
 
-    return {
-        "bath_id": bath.bath_id,
-        "name": bath.name,
-        "title": bath.title,
-        "cost": bath.cost,
-        "description": bath.description,
-        "photos": [
-            {
-                "photo_id": p.photo_id,
-                "image_url": p.image_url,
-                "bath_id": p.bath_id,
-                "massage_id": p.massage_id
-            }
-            for p in bath.photos
-        ],
-        "features": [
-            {
-                "feature_id": f.feature_id,
-                "key": f.key,
-                "value": f.value,
-                "bath_id": f.bath_id
-            }
-            for f in bath.features
-        ]
-    }
+    slots = await availability.find_free_slots(
+        db, bath_id, start, end,
+        duration=timedelta(hours=duration),
+        step=timedelta(minutes=step),
+    )
+    return BathAvailability(bath_id=bath_id, duration_hours=duration, slots=slots)
 
 # новые эндпоинты
 @router.post("/", response_model=BathOut, status_code=201)
-def create_bath(
+async def create_bath(
     bath: BathCreate,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
 ):
     # Создаём баню
     db_bath = Bath(
@@ -73,33 +105,37 @@ def create_bath(
         title=bath.title,
         cost=bath.cost,
         description=bath.description,
+        base_guests=bath.base_guests,
+        extra_guest_price=bath.extra_guest_price,
     )
     db.add(db_bath)
-    db.commit()
-    db.refresh(db_bath)
+    await db.commit()
+    await db.refresh(db_bath)
 
     # Добавляем фото
-    for url in bath.photo_urls:
-        db_photo = Photo(image_url=url, bath=db_bath)
-        db.add(db_photo)
+    known = await images.known_variants(db, bath.photo_urls)
+    photos = [Photo(image_url=url, bath_id=db_bath.bath_id, variants=known.get(url)) for url in bath.photo_urls]
+    db.add_all(photos)
 
     # Добавляем особенности
     for feature in bath.features:
-        db_feature = BathFeature(key=feature.key, value=feature.value, bath=db_bath)
+        db_feature = BathFeature(key=feature.key, value=feature.value, bath_id=db_bath.bath_id)
         db.add(db_feature)
 
-    db.commit()
-    db.refresh(db_bath)
-    return db_bath
+    await db.commit()
+    await catalog.invalidate(db_bath.bath_id)
+    images.schedule(background_tasks, photos)
+    return await load_bath(db, db_bath.bath_id)
 
 
 @router.put("/{bath_id}", response_model=BathOut)
-def update_bath(
+async def update_bath(
     bath_id: int,
     bath_update: BathUpdate,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
 ):
-    db_bath = db.query(Bath).filter(Bath.bath_id == bath_id).first()
+    db_bath = await db.get(Bath, bath_id)
     if not db_bath:
         raise HTTPException(status_code=404, detail="Баня не найдена")
 
@@ -109,36 +145,40 @@ def update_bath(
             setattr(db_bath, key, value)
 
     # Обработка фото: если передано — заменяем все
+    photos = []
     if bath_update.photo_urls is not None:
+        # Готовые копии тех же изображений переносятся в новые записи
+        known = await images.known_variants(db, bath_update.photo_urls)
         # Удаляем старые
-        db.query(Photo).filter(Photo.bath_id == bath_id).delete()
+        await db.execute(delete(Photo).where(Photo.bath_id == bath_id))
         # Добавляем новые
-        for url in bath_update.photo_urls:
-            db_photo = Photo(image_url=url, bath=db_bath)
-            db.add(db_photo)
+        photos = [Photo(image_url=url, bath_id=bath_id, variants=known.get(url)) for url in bath_update.photo_urls]
+        db.add_all(photos)
 
     # Обработка особенностей: если передано — заменяем все
     if bath_update.features is not None:
         # Удаляем старые
-        db.query(BathFeature).filter(BathFeature.bath_id == bath_id).delete()
+        await db.execute(delete(BathFeature).where(BathFeature.bath_id == bath_id))
         # Добавляем новые
         for feature in bath_update.features:
-            db_feature = BathFeature(key=feature.key, value=feature.value, bath=db_bath)
+            db_feature = BathFeature(key=feature.key, value=feature.value, bath_id=bath_id)
             db.add(db_feature)
 
-    db.commit()
-    db.refresh(db_bath)
-    return db_bath
+    await db.commit()
+    await catalog.invalidate(bath_id)
+    images.schedule(background_tasks, photos)
+    return await load_bath(db, bath_id)
 
 
 @router.delete("/{bath_id}", status_code=204)
-def delete_bath(bath_id: int, db: Session = Depends(get_db)):
-    db_bath = db.query(Bath).filter(Bath.bath_id == bath_id).first()
+async def delete_bath(bath_id: int, db: AsyncSession = Depends(get_db)):
+    db_bath = await db.get(Bath, bath_id)
     if not db_bath:
         raise HTTPException(status_code=404, detail="Баня не найдена")
     
-    db.delete(db_bath)
-    db.commit()
+    await db.delete(db_bath)
+    await db.commit()
+    await catalog.invalidate(bath_id)
     return None
 
 # добавить фото
@@ -148,32 +188,28 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 @router.post("/{bath_id}/upload", response_model=List[str])
 async def upload_bath_photos(
     bath_id: int,
+    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_bath = db.query(Bath).filter(Bath.bath_id == bath_id).first()
+    db_bath = await db.get(Bath, bath_id)
     if not db_bath:
         raise HTTPException(status_code=404, detail="Баня не найдена")
 
+    # Сохраняем файлы: потоково, параллельно, с лимитами размера, по хешу содержимого
+    urls = await uploads.save_uploads(files, UPLOAD_DIR)
+    # Те же байты уже загружались — их копии готовы
+    known = await images.known_variants(db, urls)
+
     # Удаляем старые фото (если хотите заменять)
-    db.query(Photo).filter(Photo.bath_id == bath_id).delete()
-
-    urls = []
-    for file in files:
-        # Генерируем уникальное имя файла
-        extension = file.filename.split('.')[-1]
-        unique_filename = f"{bath_id}_{file.filename.replace(' ', '_')}"
-        filepath = UPLOAD_DIR / unique_filename
-
-        # Сохраняем файл
-        content = await file.read()
-        with open(filepath, "wb") as f:
-            f.write(content)
-
-        # Сохраняем URL в базу
-        db_photo = Photo(image_url=f"/img/baths/{unique_filename}", bath=db_bath)
-        db.add(db_photo)
-        urls.append(f"/img/baths/{unique_filename}")
-
-    db.commit()
+    await db.execute(delete(Photo).where(Photo.bath_id == bath_id))
+
+    # Сохраняем URL в базу
+    photos = [Photo(image_url=url, bath_id=bath_id, variants=known.get(url)) for url in urls]
+    db.add_all(photos)
+
+    await db.commit()
+    await catalog.invalidate(bath_id)
+    # Уменьшенные копии — в фоне, после ответа
+    images.schedule(background_tasks, photos)
     return urls
\ No newline at end of file
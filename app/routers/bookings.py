@@ -1,16 +1,33 @@
 # app/routers/bookings.py
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from datetime import date, datetime
 from typing import List
+import os
 
 from app import models, schemas, database
+from app.pagination import NEXT_CURSOR_HEADER, cursor_datetime, cursor_int, decode_cursor, encode_cursor
+from app.services import events
 
 router = APIRouter(prefix="/bookings", tags=["bookings"])
 
+BOOKINGS_PAGE_SIZE = int(os.getenv("BOOKINGS_PAGE_SIZE", "50"))
+BOOKINGS_MAX_PAGE_SIZE = int(os.getenv("BOOKINGS_MAX_PAGE_SIZE", "500"))
+
+
+def with_bath_summary(query):
+    """Баня заявки тем же запросом: JOIN и только поля для списка."""
+    return query.options(
+        joinedload(models.Booking.bath, innerjoin=True)
+        .load_only(models.Bath.bath_id, models.Bath.name, models.Bath.title)
+    )
+
+
 @router.post("/", response_model=schemas.BookingOut)
-def create_booking(booking: schemas.BookingCreate, db: Session = Depends(database.get_db)):
+async def create_booking(booking: schemas.BookingCreate, db: AsyncSession = Depends(database.get_db)):
     try:
         booking_date = datetime.strptime(booking.date, "%Y-%m-%d").date()
     except ValueError:
@@ -19,7 +36,10 @@ def create_booking(booking: schemas.BookingCreate, db: Session = Depends(databas
             detail="Неверный формат даты. Используйте YYYY-MM-DD"
         )
 
-    bath = db.query(models.Bath).filter(models.Bath.bath_id == booking.bath_id).first()
+    bath = await db.get(
+        models.Bath, booking.bath_id,
+        options=[selectinload(models.Bath.photos), selectinload(models.Bath.features)]
+    )
     if not bath:
         raise HTTPException(status_code=404, detail="Баня не найдена")
 
@@ -36,8 +56,9 @@ def create_booking(booking: schemas.BookingCreate, db: Session = Depends(databas
     )
 
     db.add(db_booking)
-    db.commit()
-    db.refresh(db_booking)
+    await db.commit()
+    await db.refresh(db_booking)
+    await events.publish(events.booking_event("booking.created", db_booking))
 
     return {
         "booking_id": db_booking.booking_id,
@@ -50,75 +71,79 @@ def create_booking(booking: schemas.BookingCreate, db: Session = Depends(databas
         "email": db_booking.email,
         "notes": db_booking.notes,
         "is_read": db_booking.is_read,
-        "created_at": db_booking.created_at.isoformat(),
-        "bath": {
-            "bath_id": bath.bath_id,
-            "name": bath.name,
-            "title": bath.title,
-            "cost": bath.cost,
-            "description": bath.description,
-            "photos": [
-                {
-                    "photo_id": p.photo_id,
-                    "image_url": p.image_url,
-                    "bath_id": p.bath_id,
-                    "massage_id": p.massage_id
-                }
-                for p in bath.photos
-            ],
-            "features": [
-                {
-                    "feature_id": f.feature_id,
-                    "key": f.key,
-                    "value": f.value
-                }
-                for f in bath.features
-            ],
-        }
+        "created_at": db_booking.created_at,
+        # Фото и особенности уже загружены вместе с баней
+        "bath": schemas.BathOut.model_validate(bath),
     }
 
-@router.get("/", response_model=List[schemas.BookingOut])
-def get_all_bookings(db: Session = Depends(database.get_db)):
-    bookings = db.query(models.Booking).order_by(models.Booking.created_at.desc()).all()
-    
-    result = []
-    for booking in bookings:
-        booking_data = {
-            "booking_id": booking.booking_id,
-            "bath_id": booking.bath_id,
-            "date": booking.date.strftime("%Y-%m-%d"),
-            "duration_hours": booking.duration_hours,
-            "guests": booking.guests,
-            "name": booking.name,
-            "phone": booking.phone,
-            "email": booking.email,
-            "notes": booking.notes,
-            "is_read": booking.is_read,
-            "created_at": booking.created_at.isoformat(),
-            "bath": {
-                "bath_id": booking.bath.bath_id,
-                "name": booking.bath.name,
-                "title": booking.bath.title,
-                "cost": booking.bath.cost,
-                "description": booking.bath.description,
-                "photos": [
-                    {
-                        "photo_id": p.photo_id,
-                        "image_url": p.image_url,
-                        "bath_id": p.bath_id,
-                        "massage_id": p.massage_id
-                    }
-                    for p in booking.bath.photos
-                ],
-                "features": [
-                    {
-                        "feature_id": f.feature_id,
-                        "key": f.key,
-                        "value": f.value
-                    }
-                    for f in booking.bath.features
-                ],
-            } if booking.bath else None,
-        }
-        result.append(booking_data)
-    return result
\ No newline at end of file
+
+@router.get("/", response_model=List[schemas.BookingListItem])
+async def get_bookings(
+    response: Response,
+    unread: bool = None,
+    bath_id: int = None,
+    date_from: date = Query(None, alias="from"),
+    date_to: date = Query(None, alias="to"),
+    cursor: str = None,
+    limit: int = Query(BOOKINGS_PAGE_SIZE, ge=1, le=BOOKINGS_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(database.get_db),
+):
+    """
+    Заявки с сайта, новые сверху (created_at, booking_id по убыванию). unread=true —
+    только непрочитанные, from/to — дата посещения включительно. Если есть следующая
+    страница, её курсор возвращается в заголовке X-Next-Cursor.
+    """
+    query = with_bath_summary(select(models.Booking))
+
+    if unread is not None:
+        # Условие точно как у частичного индекса ix_bookings_unread
+        query = query.where(models.Booking.is_read == (not unread))
+    if bath_id is not None:
+        query = query.where(models.Booking.bath_id == bath_id)
+    if date_from is not None:
+        query = query.where(models.Booking.date >= date_from)
+    if date_to is not None:
+        query = query.where(models.Booking.date <= date_to)
+
+    if cursor is not None:
+        before_created, before_id = decode_cursor(cursor, 2)
+        query = query.where(
+            tuple_(models.Booking.created_at, models.Booking.booking_id)
+            < tuple_(cursor_datetime(before_created), cursor_int(before_id))
+        )
+
+    bookings = (await db.scalars(
+        query
+        .order_by(models.Booking.created_at.desc(), models.Booking.booking_id.desc())
+        .limit(limit + 1)
+    )).all()
+
+    if len(bookings) > limit:
+        bookings = bookings[:limit]
+        last = bookings[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.booking_id)
+    return bookings
+
+
+@router.get("/unread-count", response_model=schemas.BookingUnreadCount)
+async def get_unread_count(db: AsyncSession = Depends(database.get_db)):
+    """Для значка в админке: считается только по частичному индексу непрочитанных."""
+    unread = await db.scalar(
+        select(func.count()).select_from(models.Booking).where(models.Booking.is_read == False)
+    )
+    return {"unread": unread}
+
+
+@router.patch("/{booking_id}", response_model=schemas.BookingListItem)
+async def update_booking(booking_id: int, data: schemas.BookingUpdate, db: AsyncSession = Depends(database.get_db)):
+    booking = (await db.scalars(
+        with_bath_summary(select(models.Booking)).where(models.Booking.booking_id == booking_id)
+    )).first()
+    if not booking:
+        raise HTTPException(status_code=404, detail="Заявка не найдена")
+
+    if data.is_read is not None and data.is_read != booking.is_read:
+        booking.is_read = data.is_read
+        await db.commit()
+        await events.publish(events.booking_event("booking.updated", booking))
+    return booking
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.database import get_db
 from app.models import Client
@@ -8,42 +9,42 @@ from app.schemas import ClientCreate, ClientUpdate, ClientResponse
 router = APIRouter(prefix="/admin/company/client", tags=["Clients"])
 
 @router.get("/", response_model=List[ClientResponse])
-def get_clients(db: Session = Depends(get_db)):
-    return db.query(Client).all()
+async def get_clients(db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(select(Client))).all()
 
 @router.get("/{client_id}", response_model=ClientResponse)
-def get_client(client_id: int, db: Session = Depends(get_db)):
-    client = db.query(Client).filter(Client.client_id == client_id).first()
+async def get_client(client_id: int, db: AsyncSession = Depends(get_db)):
+    client = await db.scalar(select(Client).where(Client.client_id == client_id))
     if not client:
         raise HTTPException(status_code=404, detail="Партнёр не найден")
     return client
 
 @router.post("/", response_model=ClientResponse, status_code=status.HTTP_201_CREATED)
-def create_client(client_data: ClientCreate, db: Session = Depends(get_db)):
+async def create_client(client_data: ClientCreate, db: AsyncSession = Depends(get_db)):
     db_client = Client(**client_data.dict())
     db.add(db_client)
-    db.commit()
-    db.refresh(db_client)
+    await db.commit()
+    await db.refresh(db_client)
     return db_client
 
 @router.put("/{client_id}", response_model=ClientResponse)
-def update_client(client_id: int, client_data: ClientUpdate, db: Session = Depends(get_db)):
-    db_client = db.query(Client).filter(Client.client_id == client_id).first()
+async def update_client(client_id: int, client_data: ClientUpdate, db: AsyncSession = Depends(get_db)):
+    db_client = await db.scalar(select(Client).where(Client.client_id == client_id))
     if not db_client:
         raise HTTPException(status_code=404, detail="Партнёр не найден")
     
     for key, value in client_data.dict(exclude_unset=True).items():
         setattr(db_client, key, value)
     
-    db.commit()
-    db.refresh(db_client)
+    await db.commit()
+    await db.refresh(db_client)
     return db_client
 
 @router.delete("/{client_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_client(client_id: int, db: Session = Depends(get_db)):
-    db_client = db.query(Client).filter(Client.client_id == client_id).first()
+async def delete_client(client_id: int, db: AsyncSession = Depends(get_db)):
+    db_client = await db.scalar(select(Client).where(Client.client_id == client_id))
     if not db_client:
         raise HTTPException(status_code=404, detail="Партнёр не найден")
-    db.delete(db_client)
-    db.commit()
+    await db.delete(db_client)
+    await db.commit()
     return
\ No newline at end of file
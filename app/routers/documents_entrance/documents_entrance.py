@@ -1,52 +1,60 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import date as dt_date
 from app.database import get_db
 from app.models import EntranceDocument, EntranceDocumentItem, Product
 from app.schemas import EntranceDocumentCreate, EntranceDocumentRead
-from sqlalchemy.orm import joinedload
+from app.services import category_tree, stock
+from sqlalchemy.orm import joinedload, selectinload
 
 router = APIRouter(prefix="/admin/documents/entrance", tags=["Documents - Entrance"])
 
 
+def document_query():
+    # Всё, что отдаёт EntranceDocumentRead: поставщик, строки, товары строк и их фото
+    return select(EntranceDocument).options(
+        joinedload(EntranceDocument.supplier),
+        selectinload(EntranceDocument.items)
+        .joinedload(EntranceDocumentItem.product)
+        .selectinload(Product.photos)
+    )
+
+
+async def load_document(db: AsyncSession, doc_id: int):
+    return await db.scalar(
+        document_query()
+        .where(EntranceDocument.id == doc_id)
+        .execution_options(populate_existing=True)
+    )
+
+
 @router.get("/", response_model=List[EntranceDocumentRead])
-def get_documents(db: Session = Depends(get_db)):
-    return db.query(EntranceDocument)\
-             .options(
-                 joinedload(EntranceDocument.supplier),
-                 joinedload(EntranceDocument.items).joinedload(EntranceDocumentItem.product)
-             )\
-             .all()
+async def get_documents(db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(document_query())).all()
 
 
 @router.get("/{doc_id}", response_model=EntranceDocumentRead)
-def get_document(doc_id: int, db: Session = Depends(get_db)):
-    doc = db.query(EntranceDocument)\
-             .options(
-                 joinedload(EntranceDocument.items).joinedload(EntranceDocumentItem.product)
-             )\
-             .filter(EntranceDocument.id == doc_id)\
-             .first()
+async def get_document(doc_id: int, db: AsyncSession = Depends(get_db)):
+    doc = await load_document(db, doc_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     return doc
 
 
 @router.post("/", response_model=EntranceDocumentRead, status_code=status.HTTP_201_CREATED)
-def create_document(doc: EntranceDocumentCreate, db: Session = Depends(get_db)):
-    # Проверка: все product_id существуют
-    product_ids = [item.product_id for item in doc.items]
-    if not product_ids:
+async def create_document(doc: EntranceDocumentCreate, db: AsyncSession = Depends(get_db)):
+    # Проверка: все product_id существуют — заодно блокируем их одним запросом
+    if not doc.items:
         raise HTTPException(status_code=400, detail="Items are required")
-
-    existing_products = db.query(Product.id).filter(Product.id.in_(product_ids)).all()
-    existing_ids = {p.id for p in existing_products}
-    if len(existing_ids) != len(set(product_ids)):
-        missing = set(product_ids) - existing_ids
+    quantities = stock.merge_items(doc.items)
+    products = await stock.lock_products(db, quantities)
+    if len(products) != len(quantities):
+        missing = set(quantities) - set(products)
         raise HTTPException(status_code=400, detail=f"Products not found: {missing}")
 
-    # Создание документа — БЕЗ items в конструкторе
+    # Документ, строки и остатки — одной транзакцией
     db_doc = EntranceDocument(
         date=doc.date,
         supplier_id=doc.supplier_id,
@@ -55,63 +63,90 @@ def create_document(doc: EntranceDocumentCreate, db: Session = Depends(get_db)):
         total_amount=doc.total_amount,
     )
     db.add(db_doc)
-    db.commit()
-    db.refresh(db_doc)
+    await db.flush()
 
-    # Создание строк и обновление склада
-    for item in doc.items:
-        # Добавляем строку
-        db_item = EntranceDocumentItem(
+    db.add_all([
+        EntranceDocumentItem(
             document_id=db_doc.id,
             product_id=item.product_id,
             quantity=item.quantity,
             purchase_price=item.purchase_price,
         )
-        db.add(db_item)
+        for item in doc.items
+    ])
+    await stock.apply_stock_changes(db, products, quantities, stock.ENTRANCE, document_id=db_doc.id)
+    # Документ может быть задним числом — цена закупки берётся из самого позднего
+    await db.flush()
+    await stock.refresh_purchase_prices(db, products)
 
-        # Обновляем товар на складе
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if product:
-            product.total_quantity += item.quantity
-            product.last_purchase_price = item.purchase_price
+    await db.commit()
+    await category_tree.invalidate()
+    return await load_document(db, db_doc.id)
 
-    db.commit()
-    db.refresh(db_doc)
-    return db_doc
 
-@router.put("/{doc_id}", response_model=EntranceDocumentRead)
-def update_document(doc_id: int, doc: EntranceDocumentCreate, db: Session = Depends(get_db)):
-    db_doc = db.query(EntranceDocument).filter(EntranceDocument.id == doc_id).first()
+async def lock_document(db: AsyncSession, doc_id: int):
+    """Документ под блокировкой и его количества по товарам — правки одного документа идут по очереди."""
+    db_doc = await db.get(EntranceDocument, doc_id, with_for_update=True)
     if not db_doc:
         raise HTTPException(status_code=404, detail="Document not found")
+    old_quantities = stock.merge_items((await db.execute(
+        select(EntranceDocumentItem.product_id, EntranceDocumentItem.quantity)
+        .where(EntranceDocumentItem.document_id == doc_id)
+    )).all())
+    return db_doc, old_quantities
+
+@router.put("/{doc_id}", response_model=EntranceDocumentRead)
+async def update_document(doc_id: int, doc: EntranceDocumentCreate, db: AsyncSession = Depends(get_db)):
+    db_doc, old_quantities = await lock_document(db, doc_id)
+
+    # Разница старых и новых строк по товарам — остатки меняются одним UPDATE
+    quantities = stock.merge_items(doc.items)
+    deltas = {pid: quantities.get(pid, 0) - old_quantities.get(pid, 0) for pid in set(old_quantities) | set(quantities)}
+    products = await stock.lock_products(db, deltas)
+    if not set(quantities) <= set(products):
+        missing = set(quantities) - set(products)
+        raise HTTPException(status_code=400, detail=f"Products not found: {missing}")
 
     # Обновление полей
     for key, value in doc.model_dump(exclude={"items"}).items():
         setattr(db_doc, key, value)
 
-    # Удаляем старые строки
-    db.query(EntranceDocumentItem).filter(EntranceDocumentItem.document_id == doc_id).delete()
-
-    # Добавляем новые
-    for item in doc.items:
-        db_item = EntranceDocumentItem(
+    # Заменяем строки
+    await db.execute(delete(EntranceDocumentItem).where(EntranceDocumentItem.document_id == doc_id))
+    db.add_all([
+        EntranceDocumentItem(
             document_id=doc_id,
             product_id=item.product_id,
             quantity=item.quantity,
             purchase_price=item.purchase_price,
         )
-        db.add(db_item)
+        for item in doc.items
+    ])
 
-    db.commit()
-    db.refresh(db_doc)
-    return db_doc
+    # Уменьшить приход можно, только если товар ещё не израсходован
+    await stock.apply_stock_changes(db, products, deltas, stock.ENTRANCE, document_id=doc_id)
+    # Цены меняются и у товаров без изменения количества: другая цена или дата документа
+    await db.flush()
+    await stock.refresh_purchase_prices(db, products)
+
+    await db.commit()
+    await category_tree.invalidate()
+    return await load_document(db, doc_id)
 
 
 @router.delete("/{doc_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_document(doc_id: int, db: Session = Depends(get_db)):
-    db_doc = db.query(EntranceDocument).filter(EntranceDocument.id == doc_id).first()
-    if not db_doc:
-        raise HTTPException(status_code=404, detail="Document not found")
-    db.delete(db_doc)
-    db.commit()
+async def delete_document(doc_id: int, db: AsyncSession = Depends(get_db)):
+    db_doc, old_quantities = await lock_document(db, doc_id)
+
+    # Приход отменяется: весь товар документа списывается одним UPDATE
+    products = await stock.lock_products(db, old_quantities)
+    await stock.apply_stock_changes(db, products, {pid: -qty for pid, qty in old_quantities.items()},
+                                    stock.ENTRANCE, document_id=doc_id)
+
+    await db.execute(delete(EntranceDocumentItem).where(EntranceDocumentItem.document_id == doc_id))
+    await db.delete(db_doc)
+    await db.flush()
+    await stock.refresh_purchase_prices(db, products)
+    await db.commit()
+    await category_tree.invalidate()
     return
\ No newline at end of file
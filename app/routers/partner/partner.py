@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.database import get_db
 from app.models import Partner
@@ -8,42 +9,42 @@ from app.schemas import PartnerCreate, PartnerUpdate, PartnerResponse
 router = APIRouter(prefix="/admin/company/partner", tags=["Partners"])
 
 @router.get("/", response_model=List[PartnerResponse])
-def get_partners(db: Session = Depends(get_db)):
-    return db.query(Partner).all()
+async def get_partners(db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(select(Partner))).all()
 
 @router.get("/{partner_id}", response_model=PartnerResponse)
-def get_partner(partner_id: int, db: Session = Depends(get_db)):
-    partner = db.query(Partner).filter(Partner.partner_id == partner_id).first()
+async def get_partner(partner_id: int, db: AsyncSession = Depends(get_db)):
+    partner = await db.scalar(select(Partner).where(Partner.partner_id == partner_id))
     if not partner:
         raise HTTPException(status_code=404, detail="Партнёр не найден")
     return partner
 
 @router.post("/", response_model=PartnerResponse, status_code=status.HTTP_201_CREATED)
-def create_partner(partner_data: PartnerCreate, db: Session = Depends(get_db)):
+async def create_partner(partner_data: PartnerCreate, db: AsyncSession = Depends(get_db)):
     db_partner = Partner(**partner_data.dict())
     db.add(db_partner)
-    db.commit()
-    db.refresh(db_partner)
+    await db.commit()
+    await db.refresh(db_partner)
     return db_partner
 
 @router.put("/{partner_id}", response_model=PartnerResponse)
-def update_partner(partner_id: int, partner_data: PartnerUpdate, db: Session = Depends(get_db)):
-    db_partner = db.query(Partner).filter(Partner.partner_id == partner_id).first()
+async def update_partner(partner_id: int, partner_data: PartnerUpdate, db: AsyncSession = Depends(get_db)):
+    db_partner = await db.scalar(select(Partner).where(Partner.partner_id == partner_id))
     if not db_partner:
         raise HTTPException(status_code=404, detail="Партнёр не найден")
     
     for key, value in partner_data.dict(exclude_unset=True).items():
         setattr(db_partner, key, value)
     
-    db.commit()
-    db.refresh(db_partner)
+    await db.commit()
+    await db.refresh(db_partner)
     return db_partner
 
 @router.delete("/{partner_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_partner(partner_id: int, db: Session = Depends(get_db)):
-    db_partner = db.query(Partner).filter(Partner.partner_id == partner_id).first()
+async def delete_partner(partner_id: int, db: AsyncSession = Depends(get_db)):
+    db_partner = await db.scalar(select(Partner).where(Partner.partner_id == partner_id))
     if not db_partner:
         raise HTTPException(status_code=404, detail="Партнёр не найден")
-    db.delete(db_partner)
-    db.commit()
+    await db.delete(db_partner)
+    await db.commit()
     return
\ No newline at end of file
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Request
+from pydantic import TypeAdapter
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import Dict, List, Optional
 from pathlib import Path
 from app.database import get_db
 from app.models import Category, Photo
-from app.schemas import Category as CategorySchema, CategoryCreate, CategoryUpdate
+from app.schemas import Category as CategorySchema, CategoryCreate, CategoryTreeNode, CategoryUpdate
+from app.services import catalog, category_tree, images, uploads
 
 router = APIRouter(prefix="/admin/categories", tags=["categories"])
 
@@ -12,54 +17,91 @@ UPLOAD_DIR = Path("public/img/categories/")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 
+async def load_categories(db: AsyncSession) -> Dict[int, Category]:
+    """
+    Все категории с фото двумя запросами; children собираются в памяти,
+    чтобы схема могла обойти дерево любой глубины без ленивой подгрузки.
+    """
+    categories = (await db.scalars(
+        select(Category)
+        .options(selectinload(Category.photos))
+        .order_by(Category.id)
+        .execution_options(populate_existing=True)
+    )).all()
+    children = {category.id: [] for category in categories}
+    for category in categories:
+        if category.parent_id in children:
+            children[category.parent_id].append(category)
+    for category in categories:
+        set_committed_value(category, "children", children[category.id])
+    return {category.id: category for category in categories}
+
+
 @router.get("/", response_model=List[CategorySchema])
-def read_categories(db: Session = Depends(get_db)):
-    categories = db.query(Category)\
-        .options(joinedload(Category.photos))\
-        .filter(Category.parent_id.is_(None))\
-        .all()
+async def read_categories(db: AsyncSession = Depends(get_db)):
+    categories = [c for c in (await load_categories(db)).values() if c.parent_id is None]
     return categories
 
 
+CATEGORY_TREE_ADAPTER = TypeAdapter(List[CategoryTreeNode])
+
+
+@router.get("/tree", response_model=List[CategoryTreeNode])
+async def read_category_tree(request: Request, include_stats: bool = False, db: AsyncSession = Depends(get_db)):
+    """
+    Вся иерархия для бокового меню: одним запросом, из кеша, с ETag.
+    include_stats — число товаров и стоимость остатка по каждому поддереву.
+    """
+
+    async def load():
+        tree = await category_tree.load_tree(db, include_stats)
+        return CATEGORY_TREE_ADAPTER.dump_json(CATEGORY_TREE_ADAPTER.validate_python(tree))
+
+    return catalog.cached_json(request, await category_tree.get_or_load(include_stats, load))
+
+
 @router.get("/{category_id}", response_model=CategorySchema)
-def get_category(category_id: int, db: Session = Depends(get_db)):
-    category = db.query(Category)\
-        .options(joinedload(Category.photos))\
-        .filter(Category.id == category_id)\
-        .first()
+async def get_category(category_id: int, db: AsyncSession = Depends(get_db)):
+    category = (await load_categories(db)).get(category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     return category
 
 
 @router.post("/", response_model=CategorySchema, status_code=201)
-def create_category(category: CategoryCreate, db: Session = Depends(get_db)):
+async def create_category(
+    category: CategoryCreate,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
+):
     db_category = Category(
         name=category.name,
         parent_id=category.parent_id
     )
     db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
+    await db.commit()
+    await db.refresh(db_category)
+    await category_tree.invalidate()
 
     # Добавляем фото из photo_urls
     if category.photo_urls:
-        for url in category.photo_urls:
-            db_photo = Photo(image_url=url, category=db_category)
-            db.add(db_photo)
-        db.commit()
-        db.refresh(db_category)
+        known = await images.known_variants(db, category.photo_urls)
+        photos = [Photo(image_url=url, category_id=db_category.id, variants=known.get(url)) for url in category.photo_urls]
+        db.add_all(photos)
+        await db.commit()
+        images.schedule(background_tasks, photos)
 
-    return db_category
+    return (await load_categories(db))[db_category.id]
 
 
 @router.put("/{category_id}", response_model=CategorySchema)
-def update_category(
+async def update_category(
     category_id: int,
     category_update: CategoryUpdate,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
 ):
-    db_category = db.query(Category).filter(Category.id == category_id).first()
+    db_category = await db.get(Category, category_id)
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
 
@@ -74,57 +116,62 @@ def update_category(
             setattr(db_category, field, value)
 
     # Обработка фото: если photo_urls передан — заменяем все
+    photos = []
     if category_update.photo_urls is not None:
-        db.query(Photo).filter(Photo.category_id == category_id).delete()
-        for url in category_update.photo_urls:
-            db_photo = Photo(image_url=url, category=db_category)
-            db.add(db_photo)
+        known = await images.known_variants(db, category_update.photo_urls)
+        await db.execute(delete(Photo).where(Photo.category_id == category_id))
+        photos = [Photo(image_url=url, category_id=category_id, variants=known.get(url)) for url in category_update.photo_urls]
+        db.add_all(photos)
 
-    db.commit()
-    db.refresh(db_category)
-    return db_category
+    await db.commit()
+    await category_tree.invalidate()
+    images.schedule(background_tasks, photos)
+    return (await load_categories(db))[category_id]
 
 
 @router.delete("/{category_id}")
-def delete_category(category_id: int, db: Session = Depends(get_db)):
-    category = db.query(Category).filter(Category.id == category_id).first()
+async def delete_category(category_id: int, db: AsyncSession = Depends(get_db)):
+    category = await db.get(
+        Category, category_id,
+        options=[selectinload(Category.children), selectinload(Category.products)]
+    )
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     if category.children:
         raise HTTPException(status_code=400, detail="Cannot delete category with subcategories")
     if category.products:
         raise HTTPException(status_code=400, detail="Cannot delete category with products")
-    db.delete(category)
-    db.commit()
+    await db.delete(category)
+    await db.commit()
+    await category_tree.invalidate()
     return {"ok": True}
 
 
 @router.post("/{category_id}/upload", response_model=List[str])
 async def upload_category_photos(
     category_id: int,
+    background_tasks: BackgroundTasks,
     files: Optional[List[UploadFile]] = File(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Проверка существования категории
-    db_category = db.query(Category).filter(Category.id == category_id).first()
+    db_category = await db.get(Category, category_id)
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
 
-    # Удаляем все существующие фото
-    db.query(Photo).filter(Photo.category_id == category_id).delete()
-
     urls = []
+    known = {}
     if files:  # ← только если файлы переданы
-        for file in files:
-            filename = f"{category_id}_{file.filename.replace(' ', '_').replace('/', '_')}"
-            filepath = UPLOAD_DIR / filename
-            content = await file.read()
-            with open(filepath, "wb") as f:
-                f.write(content)
-            url = f"/img/categories/{filename}"
-            db_photo = Photo(image_url=url, category=db_category)
-            db.add(db_photo)
-            urls.append(url)
-
-    db.commit()
+        # Одинаковые изображения разных категорий хранятся одним файлом
+        urls = await uploads.save_uploads(files, UPLOAD_DIR)
+        known = await images.known_variants(db, urls)
+
+    # Удаляем все существующие фото
+    await db.execute(delete(Photo).where(Photo.category_id == category_id))
+
+    photos = [Photo(image_url=url, category_id=category_id, variants=known.get(url)) for url in urls]
+    db.add_all(photos)
+
+    await db.commit()
+    images.schedule(background_tasks, photos)
     return urls
\ No newline at end of file
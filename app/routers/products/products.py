@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Query
+from sqlalchemy import case, delete, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional
 import os
 from pathlib import Path
 from app.database import get_db
 from app.models import Product as ProductModel, Category, Photo, UnitOfMeasurement
-from app.schemas import Product, ProductCreate, UnitOfMeasurementResponse, StockProduct
+from app.schemas import Product, ProductCreate, ProductSearchResult, UnitOfMeasurementResponse
+from app.services import category_tree, images, product_listing, uploads
 
 router = APIRouter(prefix="/admin/products", tags=["products"])
 
@@ -13,9 +16,18 @@ router = APIRouter(prefix="/admin/products", tags=["products"])
 UPLOAD_DIR = Path("public/img/products/")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-def create_product_with_photos(db: Session, product_data: ProductCreate, photo_urls: List[str] = None):
+async def load_product(db: AsyncSession, product_id: int) -> Optional[ProductModel]:
+    # Фото нужны схеме Product; populate_existing — чтобы перечитать их после записи
+    return await db.scalar(
+        select(ProductModel)
+        .options(selectinload(ProductModel.photos))
+        .where(ProductModel.id == product_id)
+        .execution_options(populate_existing=True)
+    )
+
+async def create_product_with_photos(db: AsyncSession, product_data: ProductCreate, photo_urls: List[str] = None):
     if product_data.category_id is not None:
-        category = db.query(Category).filter(Category.id == product_data.category_id).first()
+        category = await db.get(Category, product_data.category_id)
         if not category:
             raise HTTPException(status_code=400, detail="Category does not exist")
 
@@ -27,7 +39,7 @@ def create_product_with_photos(db: Session, product_data: ProductCreate, photo_u
     )
     
     if product_data.unit_id is not None:
-        unit = db.query(UnitOfMeasurement).filter(UnitOfMeasurement.id == product_data.unit_id).first()
+        unit = await db.get(UnitOfMeasurement, product_data.unit_id)
         if not unit:
             raise HTTPException(status_code=400, detail="Unit of measurement does not exist")
 
@@ -39,121 +51,162 @@ def create_product_with_photos(db: Session, product_data: ProductCreate, photo_u
         unit_id=product_data.unit_id  
     )
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    await db.commit()
+    await db.refresh(db_product)
+    await category_tree.invalidate()
 
     if photo_urls:
         for url in photo_urls:
             db_photo = Photo(image_url=url, product_id=db_product.id)
             db.add(db_photo)
-        db.commit()
-        db.refresh(db_product)
+        await db.commit()
 
-    return db_product
+    return await load_product(db, db_product.id)
 
 # --- ЭНДПОИНТЫ ---
 
 @router.post("/", response_model=Product)
-def create_product(
+async def create_product(
     product: ProductCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    return create_product_with_photos(db, product)
+    return await create_product_with_photos(db, product)
+
 
+@router.get("/", response_model=None, responses=product_listing.PRODUCT_RESPONSES)
+async def read_products(
+    fields: Optional[str] = Query(None, description=product_listing.FIELDS_DESCRIPTION),
+    sort: str = Query("id", description=product_listing.SORT_DESCRIPTION),
+    cursor: str = None,
+    limit: int = Query(product_listing.PAGE_SIZE, ge=1, le=product_listing.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Товары постранично: поля схемы Product, но только перечисленные в fields=.
+    Фото читаются, только если запрошено поле photos.
+    """
+    return await product_listing.list_products(db, product_listing.PRODUCT_FIELDS, fields, sort, cursor, limit)
+
+def like_pattern(q: str) -> str:
+    # % и _ из строки поиска — обычные символы
+    return "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+@router.get("/search", response_model=List[ProductSearchResult])
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    category_id: Optional[int] = Query(None, description="Категория вместе с подкатегориями"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Подбор товара по подстроке названия или описания через триграммные индексы.
+    Сначала товары, чьё название начинается с q, затем по похожести названия.
+    """
+    q = q.strip()
+    pattern = like_pattern(q)
+    query = (
+        select(
+            ProductModel.id,
+            ProductModel.name,
+            ProductModel.category_id,
+            ProductModel.unit_id,
+            UnitOfMeasurement.name.label("unit"),
+            func.coalesce(ProductModel.total_quantity, 0).label("total_quantity"),
+            func.coalesce(ProductModel.last_purchase_price, 0).label("last_purchase_price"),
+        )
+        .outerjoin(UnitOfMeasurement, UnitOfMeasurement.id == ProductModel.unit_id)
+        .where(or_(ProductModel.name.ilike(pattern), ProductModel.description.ilike(pattern)))
+        .order_by(
+            case((ProductModel.name.ilike(pattern[1:]), 0), else_=1),
+            func.similarity(ProductModel.name, q).desc(),
+            ProductModel.id,
+        )
+        .limit(limit)
+        .offset(offset)
+    )
+    if category_id is not None:
+        query = query.where(ProductModel.category_id.in_(category_tree.subtree_ids(category_id)))
+    return (await db.execute(query)).mappings().all()
 
-@router.get("/", response_model=list[Product])
-def read_products(db: Session = Depends(get_db)):
-    return db.query(ProductModel)\
-             .options(
-                 joinedload(ProductModel.photos),
-                 joinedload(ProductModel.unit) 
-             ).all()
 
 @router.get("/{product_id}", response_model=Product)
-def read_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(ProductModel)\
-        .options(joinedload(ProductModel.photos))\
-        .filter(ProductModel.id == product_id)\
-        .first()
+async def read_product(product_id: int, db: AsyncSession = Depends(get_db)):
+    product = await load_product(db, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
 
 @router.put("/{product_id}", response_model=Product)
-def update_product(product_id: int, product: ProductCreate, db: Session = Depends(get_db)):
-    db_product = db.query(ProductModel).filter(ProductModel.id == product_id).first()
+async def update_product(product_id: int, product: ProductCreate, db: AsyncSession = Depends(get_db)):
+    db_product = await db.get(ProductModel, product_id)
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     if product.unit_id is not None:
-        unit = db.query(UnitOfMeasurement).filter(UnitOfMeasurement.id == product.unit_id).first()
+        unit = await db.get(UnitOfMeasurement, product.unit_id)
         if not unit:
             raise HTTPException(status_code=400, detail="Unit of measurement does not exist")
     
     for key, value in product.model_dump().items():
         setattr(db_product, key, value)
     
-    db.commit()
-    db.refresh(db_product)
-    return db_product
+    await db.commit()
+    await category_tree.invalidate()
+    return await load_product(db, product_id)
 
 
 @router.post("/{product_id}/upload", response_model=list[str])
 async def upload_product_photos(
     product_id: int,
+    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    product = db.query(ProductModel).filter(ProductModel.id == product_id).first()
+    product = await db.get(ProductModel, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    db.query(Photo).filter(Photo.product_id == product_id).delete()
-
-    urls = []
-    for file in files:
-        # Генерируем безопасное имя файла
-        extension = file.filename.split('.')[-1].lower()
-        safe_filename = f"{product_id}_{file.filename.replace(' ', '_').replace('.', '_')}.{extension}"
-        filepath = UPLOAD_DIR / safe_filename
-
-        # Сохраняем файл
-        content = await file.read()
-        with open(filepath, "wb") as f:
-            f.write(content)
-
-        # Сохраняем URL в БД
-        db_photo = Photo(
-            image_url=f"/img/products/{safe_filename}",
-            product_id=product_id
-        )
-        db.add(db_photo)
-        urls.append(f"/img/products/{safe_filename}")
+    # Сохраняем файлы: потоково, параллельно, с лимитами размера, по хешу содержимого
+    urls = await uploads.save_uploads(files, UPLOAD_DIR)
+    known = await images.known_variants(db, urls)
 
-    db.commit()
+    await db.execute(delete(Photo).where(Photo.product_id == product_id))
+
+    # Сохраняем URL в БД
+    photos = [Photo(image_url=url, product_id=product_id, variants=known.get(url)) for url in urls]
+    db.add_all(photos)
+
+    await db.commit()
+    images.schedule(background_tasks, photos)
     return urls
 
 @router.delete("/{product_id}", status_code=204)
-def delete_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(ProductModel).filter(ProductModel.id == product_id).first()
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_db)):
+    product = await db.get(ProductModel, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     # Удаляем связанные фото (если нужно удалить и файлы с диска — добавьте логику)
-    db.query(Photo).filter(Photo.product_id == product_id).delete()
+    await db.execute(delete(Photo).where(Photo.product_id == product_id))
     
-    db.delete(product)
-    db.commit()
+    await db.delete(product)
+    await db.commit()
+    await category_tree.invalidate()
     return  
 
 @router.get("/units/", response_model=List[UnitOfMeasurementResponse])
-def get_units_of_measurement(db: Session = Depends(get_db)):
-    return db.query(UnitOfMeasurement).all()
-
-@router.get("/stock/products", response_model=list[StockProduct])
-def get_stock_products(db: Session = Depends(get_db)):
-    return db.query(ProductModel)\
-             .options(
-                 joinedload(ProductModel.category),      # ← добавлено
-                 joinedload(ProductModel.unit)           # ← добавлено
-             ).all()
\ No newline at end of file
+async def get_units_of_measurement(db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(select(UnitOfMeasurement))).all()
+
+@router.get("/stock/products", response_model=None, responses=product_listing.STOCK_PRODUCT_RESPONSES)
+async def get_stock_products(
+    fields: Optional[str] = Query(None, description=product_listing.FIELDS_DESCRIPTION),
+    sort: str = Query("id", description=product_listing.SORT_DESCRIPTION),
+    cursor: str = None,
+    limit: int = Query(product_listing.PAGE_SIZE, ge=1, le=product_listing.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    """Товары склада постранично: поля схемы StockProduct, но только перечисленные в fields=."""
+    return await product_listing.list_products(db, product_listing.STOCK_PRODUCT_FIELDS, fields, sort, cursor, limit)
\ No newline at end of file
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app import models, schemas, database
 
@@ -9,9 +10,9 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[schemas.ReservationStatusBase])
-def get_reservation_statuses(db: Session = Depends(database.get_db)):
+async def get_reservation_statuses(db: AsyncSession = Depends(database.get_db)):
     """
     Получить все возможные статусы бронирований.
     """
-    statuses = db.query(models.ReservationStatus).all()
+    statuses = (await db.scalars(select(models.ReservationStatus))).all()
     return statuses
\ No newline at end of file
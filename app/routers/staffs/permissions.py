@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.database import get_db
 from app.models import PagePermission, Role
@@ -9,20 +10,20 @@ router = APIRouter(prefix="/admin/permissions", tags=["Page Permissions"])
 
 
 @router.get("/", response_model=List[PagePermissionOut])
-def get_all_permissions(db: Session = Depends(get_db)):
+async def get_all_permissions(db: AsyncSession = Depends(get_db)):
     """
     Получить все правила доступа (пути + разрешённые роли).
     """
-    return db.query(PagePermission).all()
+    return (await db.scalars(select(PagePermission))).all()
 
 
 @router.put("/{permission_id}", response_model=PagePermissionOut)
-def update_permission(permission_id: int, permission_data: PagePermissionUpdate, db: Session = Depends(get_db)):
+async def update_permission(permission_id: int, permission_data: PagePermissionUpdate, db: AsyncSession = Depends(get_db)):
     """
     Обновить список разрешённых ролей для указанного пути.
     """
     # Проверяем, существует ли правило
-    db_permission = db.query(PagePermission).filter(PagePermission.id == permission_id).first()
+    db_permission = await db.scalar(select(PagePermission).where(PagePermission.id == permission_id))
     if not db_permission:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -31,7 +32,7 @@ def update_permission(permission_id: int, permission_data: PagePermissionUpdate,
 
     # Валидация: все role_id из allowed_roles должны существовать в таблице roles
     if permission_data.allowed_roles:
-        existing_role_ids = {r.id for r in db.query(Role.id).all()}
+        existing_role_ids = set((await db.scalars(select(Role.id))).all())
         invalid_roles = set(permission_data.allowed_roles) - existing_role_ids
         if invalid_roles:
             raise HTTPException(
@@ -41,6 +42,6 @@ def update_permission(permission_id: int, permission_data: PagePermissionUpdate,
 
     # Обновляем
     db_permission.allowed_roles = permission_data.allowed_roles
-    db.commit()
-    db.refresh(db_permission)
+    await db.commit()
+    await db.refresh(db_permission)
     return db_permission
\ No newline at end of file
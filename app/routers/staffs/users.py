@@ -1,40 +1,42 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.database import get_db
 from app.models import User, Role
 from app.schemas import UserCreate, UserUpdate, UserResponse
-from app.security import hash_password
+from app.security import hash_password_async
+from app.services import user_cache
 
 router = APIRouter(prefix="/admin/company/users", tags=["Users"])
 
 
 @router.get("/", response_model=List[UserResponse])
-def get_users(db: Session = Depends(get_db)):
-    return db.query(User).all()
+async def get_users(db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(select(User))).all()
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.user_id == user_id).first()
+async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.user_id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     return user
 
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(user_data: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     # Проверка уникальности имени пользователя
-    if db.query(User).filter(User.username == user_data.username).first():
+    if await db.scalar(select(User).where(User.username == user_data.username)):
         raise HTTPException(status_code=400, detail="Пользователь с таким логином уже существует")
 
     # Проверка существования роли
-    role = db.query(Role).filter(Role.id == user_data.role_id).first()
+    role = await db.scalar(select(Role).where(Role.id == user_data.role_id))
     if not role:
         raise HTTPException(status_code=400, detail="Указанная роль не найдена")
 
     # Хеширование пароля
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password_async(user_data.password)
 
     # Создание пользователя
     db_user = User(
@@ -48,20 +50,20 @@ def create_user(user_data: UserCreate, db: Session = Depends(get_db)):
         is_active=True
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user(user_id: int, user_data: UserUpdate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.user_id == user_id).first()
+async def update_user(user_id: int, user_data: UserUpdate, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(User).where(User.user_id == user_id))
     if not db_user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
     # Если обновляется роль — проверить её существование
     if user_data.role_id is not None:
-        role = db.query(Role).filter(Role.id == user_data.role_id).first()
+        role = await db.scalar(select(Role).where(Role.id == user_data.role_id))
         if not role:
             raise HTTPException(status_code=400, detail="Указанная роль не найдена")
 
@@ -70,20 +72,22 @@ def update_user(user_id: int, user_data: UserUpdate, db: Session = Depends(get_d
     for key, value in update_data.items():
         if key == "password" and value is not None:
             # Хешировать новый пароль
-            setattr(db_user, "password_hash", hash_password(value))
+            setattr(db_user, "password_hash", await hash_password_async(value))
         elif key != "password":
             setattr(db_user, key, value)
 
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    await user_cache.invalidate(user_id)
     return db_user
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.user_id == user_id).first()
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(User).where(User.user_id == user_id))
     if not db_user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
-    db.delete(db_user)
-    db.commit()
+    await db.delete(db_user)
+    await db.commit()
+    await user_cache.invalidate(user_id)
     return
\ No newline at end of file
@@ -1,11 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
-from app.models import Product as ProductModel 
-from app.schemas import StockProduct
+from app.models import Product as ProductModel, StockMovement
+from app.schemas import StockBalance
+from app.services import product_listing
 
 router = APIRouter(prefix="/admin/stock", tags=["stock"])
 
-@router.get("/products", response_model=list[StockProduct])
-def get_stock_products(db: Session = Depends(get_db)):
-    return db.query(ProductModel).all()
\ No newline at end of file
+@router.get("/products", response_model=None, responses=product_listing.STOCK_PRODUCT_RESPONSES)
+async def get_stock_products(
+    fields: Optional[str] = Query(None, description=product_listing.FIELDS_DESCRIPTION),
+    sort: str = Query("id", description=product_listing.SORT_DESCRIPTION),
+    cursor: str = None,
+    limit: int = Query(product_listing.PAGE_SIZE, ge=1, le=product_listing.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    """Товары склада постранично: поля схемы StockProduct, но только перечисленные в fields=."""
+    return await product_listing.list_products(db, product_listing.STOCK_PRODUCT_FIELDS, fields, sort, cursor, limit)
+
+
+@router.get("/balance", response_model=List[StockBalance])
+async def get_stock_balance(
+    as_of: datetime = None,
+    category_id: int = None,
+    product_id: List[int] = Query(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Остатки товаров: текущие — из products.total_quantity, на момент as_of — из журнала
+    движений: по одной строке на товар через индекс (product_id, ts), без суммирования истории.
+    Движений до as_of нет — остаток 0.
+    """
+    if as_of is None:
+        quantity = ProductModel.total_quantity
+    else:
+        quantity = (
+            select(StockMovement.balance)
+            .where(StockMovement.product_id == ProductModel.id, StockMovement.ts <= as_of)
+            .order_by(StockMovement.ts.desc(), StockMovement.id.desc())
+            .limit(1)
+            .correlate(ProductModel)
+            .scalar_subquery()
+        )
+
+    query = select(
+        ProductModel.id.label("product_id"),
+        ProductModel.name,
+        ProductModel.unit_id,
+        func.coalesce(quantity, 0).label("quantity"),
+    ).order_by(ProductModel.id)
+    if category_id is not None:
+        query = query.where(ProductModel.category_id == category_id)
+    if product_id:
+        query = query.where(ProductModel.id.in_(product_id))
+
+    return (await db.execute(query)).mappings().all()
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import date
 
 
@@ -17,9 +17,17 @@ class PhotoBase(BaseModel):
 class PhotoCreate(PhotoBase):
     pass
 
+class PhotoVariant(BaseModel):
+    width: int
+    height: int
+    jpeg: str
+    webp: str
+
 class PhotoOut(BaseModel):
     photo_id: int
     image_url: str
+    # thumb / medium / large; None, пока копии не сделаны — тогда только image_url
+    variants: Optional[Dict[str, PhotoVariant]] = None
     bath_id: Optional[int] = None
     # massage_id: Optional[int] = None  <-- УДАЛЕНО
 
@@ -71,6 +79,11 @@ class BathOut(BathBase):
     class Config:
         from_attributes = True
 
+class BathAvailability(BaseModel):
+    bath_id: int
+    duration_hours: float
+    slots: List[datetime] = []
+
 
 # === Товары в бронировании ===
 class ReservationProductCreate(BaseModel):
@@ -121,6 +134,53 @@ class ReservationUpdate(BaseModel):
         from_attributes = True
 
 
+# === Расчёт стоимости без создания брони ===
+class ReservationQuoteItem(BaseModel):
+    bath_id: int
+    start_datetime: str
+    end_datetime: str
+    guests: int = 1
+    products: List[ReservationProductCreate] = []
+
+class ReservationQuoteRequest(BaseModel):
+    items: List[ReservationQuoteItem]
+
+class ReservationQuote(BaseModel):
+    bath_id: int
+    start_datetime: datetime
+    end_datetime: datetime
+    guests: int
+    bath_cost: int
+    extra_guest_cost: int
+    products_cost: float
+    total_cost: float
+
+
+# === Заявки с сайта → брони пакетом ===
+class BookingConversionItem(BaseModel):
+    booking_id: int
+    start_datetime: str
+    # По умолчанию — start_datetime + duration_hours из заявки
+    end_datetime: Optional[str] = None
+    # По умолчанию — баня из заявки
+    bath_id: Optional[int] = None
+
+class BookingConversionRequest(BaseModel):
+    items: List[BookingConversionItem]
+    status_id: int = 1
+
+class BookingConversionResult(BaseModel):
+    booking_id: int
+    # created / conflict / not_found / invalid
+    result: str
+    detail: Optional[str] = None
+    reservation_id: Optional[int] = None
+    bath_id: Optional[int] = None
+    start_datetime: Optional[datetime] = None
+    end_datetime: Optional[datetime] = None
+    total_cost: Optional[int] = None
+
+
 # Статусы бронирований
 class ReservationStatusBase(BaseModel):
     id: int
@@ -166,6 +226,34 @@ class BookingCreate(BookingBase):
 class BookingUpdate(BaseModel):
     is_read: Optional[bool] = None
 
+class BookingBathSummary(BaseModel):
+    bath_id: int
+    name: str
+    title: str
+
+    class Config:
+        from_attributes = True
+
+class BookingListItem(BaseModel):
+    booking_id: int
+    bath_id: int
+    date: date
+    duration_hours: int
+    guests: int
+    name: str
+    phone: str
+    email: Optional[str] = None
+    notes: Optional[str] = None
+    is_read: bool
+    created_at: datetime
+    bath: Optional[BookingBathSummary] = None
+
+    class Config:
+        from_attributes = True
+
+class BookingUnreadCount(BaseModel):
+    unread: int
+
 class BookingOut(BookingBase):
     booking_id: int
     is_read: bool
@@ -312,6 +400,7 @@ class ProductCreate(ProductBase):
 class ProductPhotoOut(BaseModel):
     photo_id: int
     image_url: str
+    variants: Optional[Dict[str, PhotoVariant]] = None
 
     class Config:
         from_attributes = True
@@ -326,6 +415,16 @@ class Product(ProductBase):
     class Config:
         from_attributes = True
 
+class ProductSearchResult(BaseModel):
+    # Подбор товара в формах: без фото и описания
+    id: int
+    name: str
+    category_id: Optional[int] = None
+    unit_id: Optional[int] = None
+    unit: Optional[str] = None
+    total_quantity: float = 0
+    last_purchase_price: float = 0.0
+
 
 # === Категории товаров (для склада) ===
 class CategoryBase(BaseModel):
@@ -350,6 +449,17 @@ class Category(CategoryBase):
 
 Category.model_rebuild()
 
+class CategoryTreeNode(BaseModel):
+    id: int
+    name: str
+    parent_id: Optional[int] = None
+    # Только при include_stats: товары и стоимость остатка всего поддерева
+    product_count: Optional[int] = None
+    stock_value: Optional[float] = None
+    children: List['CategoryTreeNode'] = []
+
+CategoryTreeNode.model_rebuild()
+
 
 # === Приходные документы ===
 class EntranceDocumentItemBase(BaseModel):
@@ -399,6 +509,12 @@ class StockProduct(BaseModel):
     class Config:
         from_attributes = True
 
+class StockBalance(BaseModel):
+    product_id: int
+    name: str
+    unit_id: Optional[int] = None
+    quantity: float
+
 # Роли доступа
 
 
@@ -1,10 +1,82 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt отпускает GIL, поэтому хватает потоков; их число — сколько ядер отдано под хеширование
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Сколько хеширований может ждать пула; сверх этого запрос сразу получает 503
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+_pool: Optional[ThreadPoolExecutor] = None
+# Задания в пуле (в очереди и выполняющиеся); уменьшается, когда задание завершено или снято из очереди
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+    return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+async def _offload(func, *args):
+    """
+    bcrypt занимает 100–300 мс процессора: в цикле событий он остановил бы все запросы,
+    а в общем пуле потоков — вытеснил бы остальную синхронную работу.
+    Место освобождает само задание, а не ожидающий запрос: отключившийся клиент
+    не должен оставлять в пуле работу, которая уже не учитывается.
+    """
+    global _pending
+    with _pending_lock:
+        if _pending >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_PENDING:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервер занят, повторите попытку позже",
+                headers={"Retry-After": "1"},
+            )
+        _pending += 1
+    try:
+        future = pool().submit(func, *args)
+    except BaseException:
+        _release(None)
+        raise
+    future.add_done_callback(_release)
+    # Отмена ожидания снимает задание, если оно ещё в очереди; начатое доработает и освободит место само
+    return await asyncio.wrap_future(future)
+
+
+def _release(_future) -> None:
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _offload(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _offload(verify_password, plain_password, hashed_password)
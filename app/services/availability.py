@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, cast, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+
+
+# Уборка после каждой брони
+CLEANING_BUFFER = timedelta(minutes=30)
+
+# SQLSTATE exclusion_violation: сработало ограничение reservations_no_overlap
+EXCLUSION_VIOLATION = "23P01"
+
+# Сколько секунд индекс живёт в кеше (страховка для нескольких воркеров)
+INDEX_TTL_SECONDS = float(os.getenv("AVAILABILITY_CACHE_TTL", "60"))
+
+
+def _align(value: datetime, aware: bool) -> datetime:
+    """
+    Приводит время из БД к виду запроса.
+    asyncpg трактует наивное время как локальное время сервера приложения,
+    поэтому для наивных запросов значения из БД переводятся в локальное время.
+    """
+    if aware or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+class BathIntervalIndex:
+    """
+    Занятость одной бани на окне [window_start, window_end).
+    Каждая бронь занимает [start_datetime, end_datetime + 30 минут), пересекающиеся
+    интервалы склеиваются, поэтому starts и ends отсортированы и не перекрываются.
+    """
+
+    def __init__(self, bath_id: int, window_start: datetime, window_end: datetime,
+                 intervals: List[Tuple[datetime, datetime]]):
+        self.bath_id = bath_id
+        self.window_start = window_start
+        self.window_end = window_end
+        self.loaded_at = time.monotonic()
+        self.starts: List[datetime] = []
+        self.ends: List[datetime] = []
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def covers(self, start: datetime, end: datetime) -> bool:
+        return self.window_start <= start and end <= self.window_end
+
+    def conflicts(self, start: datetime, end: datetime) -> bool:
+        """Пересекается ли [start, end) с занятым временем."""
+        i = bisect_right(self.ends, start)
+        return i < len(self.starts) and self.starts[i] < end
+
+    def add(self, start: datetime, end: datetime) -> None:
+        """Занимает [start, end), склеивая с пересекающимися и соседними интервалами."""
+        i = bisect_left(self.ends, start)
+        j = bisect_right(self.starts, end)
+        if i < j:
+            start = min(start, self.starts[i])
+            end = max(end, self.ends[j - 1])
+        self.starts[i:j] = [start]
+        self.ends[i:j] = [end]
+
+    def free_slots(self, start: datetime, end: datetime, duration: timedelta, step: timedelta) -> List[datetime]:
+        """
+        Все начала из сетки start + k * step в [start, end), с которых баня свободна на duration
+        (duration уже должна включать уборку после новой брони).
+        Сетка и интервалы проходятся один раз.
+        """
+        slots = []
+        i = 0
+        total = len(self.starts)
+        candidate = start
+        while candidate < end:
+            finish = candidate + duration
+            while i < total and self.ends[i] <= candidate:
+                i += 1
+            if i < total and self.starts[i] < finish:
+                # Перепрыгиваем занятый интервал до ближайшего узла сетки
+                steps = -(-(self.ends[i] - candidate) // step)
+                candidate += step * max(steps, 1)
+                continue
+            slots.append(candidate)
+            candidate += step
+        return slots
+
+
+class IntervalIndexCache:
+    """Последний загруженный индекс для каждой бани."""
+
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        self._entries: Dict[Tuple[int, bool], BathIntervalIndex] = {}
+        self._lock = threading.Lock()
+
+    def get(self, bath_id: int, start: datetime, end: datetime) -> Optional[BathIntervalIndex]:
+        key = (bath_id, start.tzinfo is not None)
+        with self._lock:
+            index = self._entries.get(key)
+            if index is None:
+                return None
+            if time.monotonic() - index.loaded_at > self._ttl:
+                del self._entries[key]
+                return None
+        return index if index.covers(start, end) else None
+
+    def put(self, index: BathIntervalIndex) -> None:
+        key = (index.bath_id, index.window_start.tzinfo is not None)
+        with self._lock:
+            self._entries[key] = index
+
+    def invalidate(self, bath_id: Optional[int] = None) -> None:
+        with self._lock:
+            if bath_id is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == bath_id]:
+                del self._entries[key]
+
+
+_cache = IntervalIndexCache(INDEX_TTL_SECONDS)
+
+
+def overlaps(start: datetime, end: datetime):
+    """
+    Условие «бронь занимает что-то в [start, end)» по busy_range — его обслуживает
+    GiST-индекс ограничения reservations_no_overlap.
+    """
+    return models.Reservation.busy_range.op("&&")(
+        func.tstzrange(cast(start, DateTime(timezone=True)), cast(end, DateTime(timezone=True)), "[)")
+    )
+
+
+def to_local(value: datetime) -> datetime:
+    """Наивное локальное время — чтобы сравнивать между собой время с поясом и без."""
+    return _align(value, aware=False)
+
+
+def is_overlap_violation(error: IntegrityError) -> bool:
+    return getattr(error.orig, "pgcode", None) == EXCLUSION_VIOLATION
+
+
+def invalidate(*bath_ids: int) -> None:
+    """Сбрасывает индексы бань после создания, изменения или удаления брони."""
+    for bath_id in bath_ids:
+        if bath_id is not None:
+            _cache.invalidate(bath_id)
+
+
+def handle_event(event: dict) -> None:
+    """Брони, изменённые в других воркерах, приходят через брокер событий."""
+    if event.get("type", "").startswith("reservation."):
+        invalidate(event.get("bath_id"), event.get("previous_bath_id"))
+
+
+async def load_index(db: AsyncSession, bath_id: int, start: datetime, end: datetime,
+                     fresh: bool = False) -> BathIntervalIndex:
+    """
+    Индекс занятости бани, покрывающий [start, end).
+    Окно расширяется до целых суток, чтобы соседние запросы попадали в кеш.
+    fresh — читать из БД в обход кеша (перед записью броней).
+    """
+    index = None if fresh else _cache.get(bath_id, start, end)
+    if index is not None:
+        return index
+
+    window_start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    window_end = end.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+    rows = (await db.execute(
+        select(models.Reservation.start_datetime, models.Reservation.end_datetime).where(
+            models.Reservation.bath_id == bath_id,
+            overlaps(window_start, window_end)
+        )
+    )).all()
+
+    aware = start.tzinfo is not None
+    index = BathIntervalIndex(
+        bath_id,
+        window_start,
+        window_end,
+        [(_align(r.start_datetime, aware), _align(r.end_datetime, aware) + CLEANING_BUFFER) for r in rows],
+    )
+    _cache.put(index)
+    return index
+
+
+async def find_free_slots(db: AsyncSession, bath_id: int, start: datetime, end: datetime,
+                          duration: timedelta, step: timedelta) -> List[datetime]:
+    # Новой брони тоже нужна уборка до начала следующей
+    occupied = duration + CLEANING_BUFFER
+    index = await load_index(db, bath_id, start, end + occupied)
+    return index.free_slots(start, end, occupied, step)
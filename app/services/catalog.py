@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Hashable, NamedTuple, Optional
+
+from fastapi import Request, Response
+
+from app.services import events
+
+
+# Сколько секунд ответ живёт в кеше (страховка, если событие от другого воркера потерялось)
+CATALOG_TTL_SECONDS = float(os.getenv("BATH_CATALOG_CACHE_TTL", "300"))
+
+BATHS_CHANGED = "baths.changed"
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    loaded_at: float
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match сравнивается слабо: W/"x" совпадает с "x"."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def cached_json(request: Request, entry: CachedResponse) -> Response:
+    # no-cache: браузер каждый раз спрашивает сервер, но при совпавшем ETag получает пустой 304
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """
+    Готовые тела JSON-ответов каталога бань. Сброс увеличивает поколение,
+    поэтому ответ, собранный до сброса, в кеш уже не попадёт.
+    """
+
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        self._entries: Dict[Hashable, CachedResponse] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._load_lock: Optional[asyncio.Lock] = None
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.loaded_at > self._ttl:
+                del self._entries[key]
+                return None
+            return entry
+
+    async def get_or_load(self, key: Hashable, load: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[CachedResponse]:
+        """load возвращает сериализованный ответ или None, если объекта нет (None не кешируется)."""
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        # Промах у множества запросов сразу — в БД идёт только один из них
+        async with self._load_lock:
+            entry = self.get(key)
+            if entry is not None:
+                return entry
+            generation = self._generation
+            body = await load()
+            if body is None:
+                return None
+            entry = CachedResponse(body, make_etag(body), time.monotonic())
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = entry
+            return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+_cache = ResponseCache(CATALOG_TTL_SECONDS)
+
+
+def get_or_load(key: Hashable, load: Callable[[], Awaitable[Optional[bytes]]]):
+    return _cache.get_or_load(key, load)
+
+
+async def invalidate(bath_id: Optional[int] = None) -> None:
+    """
+    Вызывать после commit любого изменения бани, её фото или особенностей.
+    Список содержит все бани, поэтому сбрасывается весь каталог — и в других воркерах тоже.
+    """
+    _cache.clear()
+    await events.publish({"type": BATHS_CHANGED, "bath_id": bath_id})
+
+
+def handle_event(event: dict) -> None:
+    if event.get("type") == BATHS_CHANGED:
+        _cache.clear()
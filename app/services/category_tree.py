@@ -0,0 +1,93 @@
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.services import catalog, events
+
+
+# Сколько секунд дерево живёт в кеше (страховка, если событие от другого воркера потерялось)
+CATEGORY_TREE_TTL_SECONDS = float(os.getenv("CATEGORY_TREE_CACHE_TTL", "300"))
+
+CATEGORIES_CHANGED = "categories.changed"
+
+
+def subtree_ids(category_id: int):
+    """SELECT id категории и всех её потомков — для фильтров вида category_id IN (...)."""
+    tree = select(models.Category.id).where(models.Category.id == category_id).cte("category_subtree", recursive=True)
+    tree = tree.union_all(select(models.Category.id).join(tree, models.Category.parent_id == tree.c.id))
+    return select(tree.c.id)
+
+
+async def load_tree(db: AsyncSession, include_stats: bool) -> List[dict]:
+    """
+    Всё дерево категорий одним рекурсивным запросом; узлы связываются в памяти за O(n).
+    include_stats — по каждому поддереву число товаров и стоимость остатка
+    (total_quantity * last_purchase_price), сворачиваются снизу вверх.
+    """
+    tree = select(
+        models.Category.id, models.Category.parent_id, models.Category.name, literal(0).label("depth")
+    ).where(models.Category.parent_id.is_(None)).cte("category_tree", recursive=True)
+    tree = tree.union_all(
+        select(models.Category.id, models.Category.parent_id, models.Category.name, tree.c.depth + 1)
+        .join(tree, models.Category.parent_id == tree.c.id)
+    )
+
+    query = select(tree.c.id, tree.c.parent_id, tree.c.name)
+    if include_stats:
+        own = select(
+            models.Product.category_id,
+            func.count().label("product_count"),
+            func.sum(
+                func.coalesce(models.Product.total_quantity, 0) * func.coalesce(models.Product.last_purchase_price, 0)
+            ).label("stock_value"),
+        ).group_by(models.Product.category_id).subquery()
+        query = query.add_columns(
+            func.coalesce(own.c.product_count, 0).label("product_count"),
+            func.coalesce(own.c.stock_value, 0).label("stock_value"),
+        ).outerjoin(own, own.c.category_id == tree.c.id)
+    # По уровням: родитель всегда раньше своих детей
+    rows = (await db.execute(query.order_by(tree.c.depth, tree.c.id))).all()
+
+    nodes: Dict[int, dict] = {}
+    roots: List[dict] = []
+    for row in rows:
+        node = {"id": row.id, "name": row.name, "parent_id": row.parent_id, "children": []}
+        if include_stats:
+            node["product_count"] = row.product_count
+            node["stock_value"] = float(row.stock_value)
+        nodes[row.id] = node
+        if row.parent_id is None:
+            roots.append(node)
+        else:
+            nodes[row.parent_id]["children"].append(node)
+
+    if include_stats:
+        for row in reversed(rows):
+            if row.parent_id is not None:
+                parent, node = nodes[row.parent_id], nodes[row.id]
+                parent["product_count"] += node["product_count"]
+                parent["stock_value"] += node["stock_value"]
+    return roots
+
+
+_cache = catalog.ResponseCache(CATEGORY_TREE_TTL_SECONDS)
+
+
+def get_or_load(include_stats: bool, load: Callable[[], Awaitable[Optional[bytes]]]):
+    return _cache.get_or_load(include_stats, load)
+
+
+async def invalidate() -> None:
+    """Вызывать после commit изменения категорий, товаров или их остатков и цен — и в других воркерах тоже."""
+    _cache.clear()
+    await events.publish({"type": CATEGORIES_CHANGED})
+
+
+def handle_event(event: dict) -> None:
+    # Брони списывают и возвращают товар — стоимость остатков поддеревьев меняется
+    event_type = event.get("type", "")
+    if event_type == CATEGORIES_CHANGED or event_type.startswith("reservation."):
+        _cache.clear()
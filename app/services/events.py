@@ -0,0 +1,187 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import select
+import threading
+from datetime import date, datetime
+from typing import Callable, List, Optional
+
+import psycopg2
+from sqlalchemy import func, select as sql_select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import ASYNC_DATABASE_URL, engine
+
+
+logger = logging.getLogger(__name__)
+
+# local — события видит только текущий процесс, postgres — все воркеры через LISTEN/NOTIFY
+EVENTS_BROKER = os.getenv("EVENTS_BROKER", "postgres")
+CHANNEL = "app_events"
+SUBSCRIBER_QUEUE_SIZE = 1000
+# Соединений для NOTIFY на воркер
+EVENTS_PUBLISH_POOL_SIZE = int(os.getenv("EVENTS_PUBLISH_POOL_SIZE", "2"))
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def reservation_event(event_type: str, reservation, **extra) -> dict:
+    return {
+        "type": event_type,
+        "reservation_id": reservation.reservation_id,
+        "bath_id": reservation.bath_id,
+        "start_datetime": reservation.start_datetime,
+        "end_datetime": reservation.end_datetime,
+        "status_id": reservation.status_id,
+        **extra,
+    }
+
+
+def booking_event(event_type: str, booking) -> dict:
+    return {
+        "type": event_type,
+        "booking_id": booking.booking_id,
+        "bath_id": booking.bath_id,
+        "date": booking.date,
+        "is_read": booking.is_read,
+    }
+
+
+class Subscription:
+    """Очередь событий одного клиента. Если клиент не успевает читать, он получает resync."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def _put(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def deliver(self, event: dict) -> None:
+        self.loop.call_soon_threadsafe(self._put, event)
+
+
+class LocalBroker:
+    """Раздаёт события подписчикам и обработчикам внутри процесса."""
+
+    def __init__(self):
+        self._subscriptions: List[Subscription] = []
+        self._handlers: List[Callable[[dict], None]] = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def add_handler(self, handler: Callable[[dict], None]) -> None:
+        """Синхронный обработчик (например, сброс кеша); вызывается в потоке, где пришло событие."""
+        self._handlers.append(handler)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    async def publish(self, event: dict) -> None:
+        """Вызывать после commit — откатившиеся изменения не должны попадать к клиентам."""
+        self._dispatch(json.loads(json.dumps(event, default=_json_default)))
+
+    def _dispatch(self, event: dict) -> None:
+        event["id"] = next(self._ids)
+        for handler in self._handlers:
+            try:
+                handler(event)
+            except Exception:
+                logger.exception("Event handler failed for %s", event.get("type"))
+        # internal — только для сброса кешей в воркерах, клиентам SSE оно ни к чему
+        if event.get("internal"):
+            return
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Публикует через NOTIFY, а каждый воркер слушает канал на отдельном соединении
+    и раздаёт полученное своим подписчикам — в том числе и свои же события.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Свой пул: публикуют изнутри запроса, который уже держит соединение из общего пула, —
+        # при занятом общем пуле запросы ждали бы друг друга до таймаута
+        self._publish_engine = create_async_engine(
+            ASYNC_DATABASE_URL, pool_size=EVENTS_PUBLISH_POOL_SIZE, max_overflow=0
+        )
+
+    async def publish(self, event: dict) -> None:
+        payload = json.dumps(event, default=_json_default)
+        try:
+            async with self._publish_engine.connect() as conn:
+                await conn.execute(sql_select(func.pg_notify(CHANNEL, payload)))
+                await conn.commit()
+        except Exception:
+            logger.exception("Failed to publish %s", event.get("type"))
+
+    async def start(self) -> None:
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._listen, name="events-listener", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join, 5)
+        await self._publish_engine.dispose()
+
+    def _listen(self) -> None:
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while not self._stopping.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(dsn)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {CHANNEL}")
+                while not self._stopping.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self._dispatch(json.loads(notify.payload))
+            except Exception:
+                logger.exception("Events listener connection lost, reconnecting")
+                self._stopping.wait(2)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+broker: LocalBroker = PostgresBroker() if EVENTS_BROKER == "postgres" else LocalBroker()
+
+
+async def publish(event: dict) -> None:
+    await broker.publish(event)
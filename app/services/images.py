@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from PIL import Image, ImageOps
+from sqlalchemy import bindparam, select
+
+from app import database, models
+from app.services import catalog
+from app.services.uploads import path_for, url_for
+from app.static_files import CONTENT_ADDRESSED_NAME
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_URL_PREFIX = "/img/"
+
+# Ширина копий для srcset; оригиналы меньше этой ширины не увеличиваются
+VARIANT_WIDTHS = {"thumb": 160, "medium": 640, "large": 1280}
+VARIANT_FORMATS = {"jpeg": "jpg", "webp": "webp"}
+
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "82"))
+WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+# Процессов для обработки изображений в каждом воркере
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+
+def variant_path(original: Path, name: str, fmt: str) -> Path:
+    """public/img/baths/ab/abc.jpg → public/img/baths/ab/abc.thumb.webp"""
+    return original.with_name(f"{original.stem}.{name}.{VARIANT_FORMATS[fmt]}")
+
+
+def variant_paths(url: str) -> Optional[List[Path]]:
+    original = path_for(url)
+    if original is None:
+        return None
+    return [variant_path(original, name, fmt) for name in VARIANT_WIDTHS for fmt in VARIANT_FORMATS]
+
+
+def _save(image: Image.Image, target: Path, fmt: str) -> None:
+    tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        if fmt == "jpeg":
+            image.save(tmp, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        else:
+            image.save(tmp, "WEBP", quality=WEBP_QUALITY, method=4)
+        os.replace(tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _existing_variants(original: Path) -> Optional[dict]:
+    """Копии уже есть и не старше оригинала — читаем только их размеры."""
+    # Файл по хешу не меняется, его mtime обновляется при повторной загрузке тех же байт
+    mtime = 0 if CONTENT_ADDRESSED_NAME.match(original.name) else original.stat().st_mtime
+    variants = {}
+    for name in VARIANT_WIDTHS:
+        paths = {fmt: variant_path(original, name, fmt) for fmt in VARIANT_FORMATS}
+        if not all(p.exists() and p.stat().st_mtime >= mtime for p in paths.values()):
+            return None
+        with Image.open(paths["jpeg"]) as image:
+            width, height = image.size
+        variants[name] = {"width": width, "height": height, **{fmt: url_for(p) for fmt, p in paths.items()}}
+    return variants
+
+
+def make_variants(url: str, force: bool = False) -> Optional[dict]:
+    """
+    Выполняется в процессе пула: уменьшенные копии оригинала в JPEG и WebP.
+    None — если это не локальное изображение или его не удалось прочитать.
+    """
+    if not url.startswith(IMAGE_URL_PREFIX):
+        return None
+    original = path_for(url)
+    if original is None:
+        return None
+    try:
+        if not force:
+            existing = _existing_variants(original)
+            if existing is not None:
+                return existing
+
+        with Image.open(original) as source:
+            image = ImageOps.exif_transpose(source)
+            has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+        variants = {}
+        for name, width in VARIANT_WIDTHS.items():
+            resized = image.copy()
+            resized.thumbnail((width, image.height), Image.Resampling.LANCZOS)
+            # У JPEG нет прозрачности — фон белый
+            flat = resized
+            if has_alpha:
+                flat = Image.new("RGB", resized.size, "white")
+                flat.paste(resized, mask=resized.getchannel("A"))
+            paths = {fmt: variant_path(original, name, fmt) for fmt in VARIANT_FORMATS}
+            _save(flat, paths["jpeg"], "jpeg")
+            _save(resized, paths["webp"], "webp")
+            variants[name] = {"width": resized.width, "height": resized.height,
+                              **{fmt: url_for(p) for fmt, p in paths.items()}}
+        return variants
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning("Cannot make variants for %s: %s", url, e)
+        return None
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, а не fork: форк процесса с циклом событий и потоками небезопасен
+        _pool = ProcessPoolExecutor(IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+async def render(urls: Iterable[str], force: bool = False) -> List[Optional[dict]]:
+    """Копии для нескольких изображений параллельно в пуле процессов."""
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(loop.run_in_executor(pool(), make_variants, url, force) for url in urls))
+
+
+async def save_variants(results: Dict[int, Optional[dict]]) -> None:
+    if not results:
+        return
+    # UPDATE по таблице, а не ORM: фото могли удалить, пока делались копии, — это не ошибка
+    photos = models.Photo.__table__
+    async with database.AsyncSessionLocal() as db:
+        await db.execute(
+            photos.update().where(photos.c.photo_id == bindparam("b_photo_id")).values(variants=bindparam("b_variants")),
+            [{"b_photo_id": photo_id, "b_variants": variants} for photo_id, variants in results.items()],
+        )
+        await db.commit()
+
+
+async def process_photos(photo_ids: List[int]) -> None:
+    """
+    Фоновая задача после загрузки: делает копии и записывает их в photos.variants.
+    Соединение с БД не держится, пока идёт обработка изображений.
+    """
+    async with database.AsyncSessionLocal() as db:
+        photos = (await db.execute(
+            select(models.Photo.photo_id, models.Photo.image_url, models.Photo.bath_id)
+            .where(models.Photo.photo_id.in_(photo_ids))
+        )).all()
+    results = await render(photo.image_url for photo in photos)
+    await save_variants({photo.photo_id: variants for photo, variants in zip(photos, results)})
+    for bath_id in {photo.bath_id for photo in photos if photo.bath_id is not None}:
+        await catalog.invalidate(bath_id)
+
+
+async def known_variants(db, urls: Iterable[str]) -> Dict[str, dict]:
+    """Готовые копии по URL — чтобы при замене списка фото не делать их заново."""
+    urls = {url for url in urls if path_for(url) is not None}
+    if not urls:
+        return {}
+    rows = await db.execute(
+        select(models.Photo.image_url, models.Photo.variants)
+        .where(models.Photo.image_url.in_(urls), models.Photo.variants.is_not(None))
+    )
+    return {url: variants for url, variants in rows}
+
+
+def schedule(background_tasks, photos: Iterable[models.Photo]) -> None:
+    """После коммита: копии для фото без них делаются в фоне, уже после ответа."""
+    # Для URL за пределами public/img копии не делаются — make_variants их всё равно отклонит
+    photo_ids = [photo.photo_id for photo in photos
+                 if photo.variants is None and path_for(photo.image_url) is not None]
+    if photo_ids:
+        background_tasks.add_task(process_photos, photo_ids)
@@ -0,0 +1,172 @@
+import os
+import time
+from collections import OrderedDict, deque
+from datetime import timedelta
+from typing import Deque, Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database, models
+
+
+# memory — счётчики в памяти воркера, postgres — общие для всех воркеров в таблице login_failures
+LOGIN_THROTTLE_STORE = os.getenv("LOGIN_THROTTLE_STORE", "memory")
+# Скользящее окно и сколько неудачных попыток в нём допускается
+LOGIN_THROTTLE_WINDOW_SECONDS = float(os.getenv("LOGIN_THROTTLE_WINDOW", "300"))
+LOGIN_MAX_FAILURES_PER_USERNAME = int(os.getenv("LOGIN_MAX_FAILURES_PER_USERNAME", "5"))
+LOGIN_MAX_FAILURES_PER_IP = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "20"))
+# Сколько ключей помнит воркер; самые давние вытесняются
+LOGIN_THROTTLE_MAX_KEYS = int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", "10000"))
+
+
+def username_key(username: str) -> str:
+    # Регистр и пробелы не обходят ограничение
+    return f"user:{username.strip().lower()[:100]}"
+
+
+def ip_key(ip: str) -> str:
+    return f"ip:{ip}"
+
+
+def throttle_limits(username: str, ip: str) -> Dict[str, int]:
+    """Ключи попытки и лимит неудач для каждого."""
+    return {username_key(username): LOGIN_MAX_FAILURES_PER_USERNAME, ip_key(ip): LOGIN_MAX_FAILURES_PER_IP}
+
+
+class MemoryStore:
+    """
+    Времена попыток по ключу за последнее окно. Проверка и запись идут без await между ними,
+    поэтому в пределах воркера атомарны.
+    """
+
+    def __init__(self, window: float, max_keys: int):
+        self._window = window
+        self._max_keys = max_keys
+        self._attempts: "OrderedDict[str, Deque[float]]" = OrderedDict()
+
+    def _recent(self, key: str, now: float) -> Deque[float]:
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            return deque()
+        while attempts and attempts[0] <= now - self._window:
+            attempts.popleft()
+        if not attempts:
+            del self._attempts[key]
+        return attempts
+
+    def _wait(self, key: str, limit: int, now: float) -> float:
+        attempts = self._recent(key, now)
+        if len(attempts) < limit:
+            return 0
+        # Попытка снова разрешена, когда из окна выйдет столько попыток, чтобы их стало меньше лимита
+        return attempts[len(attempts) - limit] + self._window - now
+
+    async def acquire(self, limits: Dict[str, int]) -> Tuple[float, Dict[str, float]]:
+        now = time.time()
+        wait = max(self._wait(key, limit, now) for key, limit in limits.items())
+        if wait > 0:
+            return wait, {}
+        for key in limits:
+            attempts = self._recent(key, now)
+            attempts.append(now)
+            self._attempts[key] = attempts
+            self._attempts.move_to_end(key)
+        while len(self._attempts) > self._max_keys:
+            self._attempts.popitem(last=False)
+        return 0, {key: now for key in limits}
+
+    async def release(self, key: str, token: float) -> None:
+        attempts = self._attempts.get(key)
+        if attempts and token in attempts:
+            attempts.remove(token)
+
+    async def reset(self, key: str) -> None:
+        self._attempts.pop(key, None)
+
+
+class PostgresStore:
+    """
+    То же в таблице login_failures: время считает БД, поэтому часы воркеров не важны.
+    Проверка и запись — одна транзакция под advisory-блокировками ключей.
+    """
+
+    def __init__(self, window: float):
+        self._window = timedelta(seconds=window)
+
+    async def _wait(self, db: AsyncSession, key: str, limit: int) -> float:
+        recent = (
+            select(models.LoginFailure.ts)
+            .where(models.LoginFailure.key == key, models.LoginFailure.ts > func.now() - self._window)
+            .order_by(models.LoginFailure.ts.desc())
+            .limit(limit)
+            .subquery()
+        )
+        count, wait = (await db.execute(select(
+            func.count(), func.extract("epoch", func.min(recent.c.ts) + self._window - func.now())
+        ))).one()
+        return float(wait) if count >= limit else 0
+
+    async def acquire(self, limits: Dict[str, int]) -> Tuple[float, Dict[str, int]]:
+        async with database.AsyncSessionLocal() as db:
+            # Попытки по одному ключу из всех воркеров идут по очереди; порядок ключей один — без взаимоблокировок
+            for key in sorted(limits):
+                await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(key))))
+            wait = max([await self._wait(db, key, limit) for key, limit in limits.items()])
+            if wait > 0:
+                await db.rollback()
+                return wait, {}
+            await db.execute(delete(models.LoginFailure).where(models.LoginFailure.ts <= func.now() - self._window))
+            rows = (await db.execute(
+                insert(models.LoginFailure)
+                .values([{"key": key} for key in limits])
+                .returning(models.LoginFailure.key, models.LoginFailure.id)
+            )).all()
+            await db.commit()
+        return 0, {row.key: row.id for row in rows}
+
+    async def release(self, key: str, token: int) -> None:
+        async with database.AsyncSessionLocal() as db:
+            await db.execute(delete(models.LoginFailure).where(models.LoginFailure.id == token))
+            await db.commit()
+
+    async def reset(self, key: str) -> None:
+        async with database.AsyncSessionLocal() as db:
+            await db.execute(delete(models.LoginFailure).where(models.LoginFailure.key == key))
+            await db.commit()
+
+
+store = PostgresStore(LOGIN_THROTTLE_WINDOW_SECONDS) if LOGIN_THROTTLE_STORE == "postgres" \
+    else MemoryStore(LOGIN_THROTTLE_WINDOW_SECONDS, LOGIN_THROTTLE_MAX_KEYS)
+
+
+class Attempt(NamedTuple):
+    username_key: str
+    ip_key: str
+    # Записи попытки в хранилище по ключам — чтобы снять именно их
+    tokens: Dict[str, object]
+
+
+async def begin(username: str, ip: str) -> Tuple[float, Optional[Attempt]]:
+    """
+    Вызывать до поиска пользователя и хеширования пароля. Попытка сразу записывается как неудачная,
+    поэтому одновременные запросы не проходят проверку все разом.
+    Возвращает (через сколько секунд можно пробовать снова, None), если лимит исчерпан.
+    """
+    limits = throttle_limits(username, ip)
+    retry_after, tokens = await store.acquire(limits)
+    if retry_after > 0:
+        return retry_after, None
+    return 0, Attempt(username_key(username), ip_key(ip), tokens)
+
+
+async def succeed(attempt: Attempt) -> None:
+    """Удачный вход обнуляет счётчик логина; с адреса снимается только эта попытка — с него могли перебирать другие логины."""
+    await store.reset(attempt.username_key)
+    await store.release(attempt.ip_key, attempt.tokens[attempt.ip_key])
+
+
+async def cancel(attempt: Attempt) -> None:
+    """Попытка не дошла до проверки пароля (например, пул хеширования занят) — не считать её."""
+    for key, token in attempt.tokens.items():
+        await store.release(key, token)
@@ -0,0 +1,92 @@
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+
+
+class Price(NamedTuple):
+    bath_cost: int
+    extra_guest_cost: int
+    products_cost: float
+    total_cost: float
+
+
+class BathTariff(NamedTuple):
+    cost: int
+    base_guests: int
+    extra_guest_price: int
+
+
+class ProductPrice(NamedTuple):
+    last_purchase_price: float
+
+
+class QuoteLine(NamedTuple):
+    bath_id: int
+    start: datetime
+    end: datetime
+    guests: int
+    quantities: Dict[int, int]
+
+
+def price_reservation(bath, start: datetime, end: datetime, guests: int,
+                      products: Dict[int, models.Product], quantities: Dict[int, int]) -> Price:
+    """
+    Стоимость брони: баня по часам + гости сверх base_guests + товары по последней закупочной цене.
+    bath и products — любые объекты с полями тарифа (ORM-строки, BathTariff, ProductPrice).
+    Товар без цены закупки (NULL) стоит 0.
+    """
+    duration_hours = (end - start).total_seconds() / 3600
+    bath_cost = int(bath.cost * duration_hours)
+    extra_guest_cost = max(0, guests - bath.base_guests) * bath.extra_guest_price
+    products_cost = sum((products[pid].last_purchase_price or 0.0) * qty for pid, qty in quantities.items())
+    return Price(bath_cost, extra_guest_cost, products_cost, bath_cost + extra_guest_cost + products_cost)
+
+
+async def load_tariffs(db: AsyncSession, bath_ids) -> Dict[int, BathTariff]:
+    rows = (await db.execute(
+        select(models.Bath.bath_id, models.Bath.cost, models.Bath.base_guests, models.Bath.extra_guest_price)
+        .where(models.Bath.bath_id.in_(set(bath_ids)))
+    )).all()
+    return {r.bath_id: BathTariff(r.cost, r.base_guests, r.extra_guest_price) for r in rows}
+
+
+async def load_product_prices(db: AsyncSession, product_ids) -> Dict[int, ProductPrice]:
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    rows = (await db.execute(
+        select(models.Product.id, models.Product.last_purchase_price)
+        .where(models.Product.id.in_(product_ids))
+    )).all()
+    return {r.id: ProductPrice(r.last_purchase_price) for r in rows}
+
+
+async def quote_many(db: AsyncSession, lines: Sequence[QuoteLine],
+                     tariffs: Optional[Dict[int, BathTariff]] = None) -> List[Price]:
+    """
+    Цены для множества вариантов брони. Тарифы бань и цены товаров читаются
+    двумя запросами на весь пакет, дальше каждый вариант считает price_reservation.
+    tariffs — уже загруженные load_tariffs, чтобы не читать их повторно; товаров
+    в вариантах нет — нет и запроса цен.
+    """
+    if tariffs is None:
+        tariffs = await load_tariffs(db, (line.bath_id for line in lines))
+    for line in lines:
+        if line.bath_id not in tariffs:
+            raise HTTPException(status_code=404, detail=f"Баня с ID {line.bath_id} не найдена")
+
+    prices = await load_product_prices(db, (pid for line in lines for pid in line.quantities))
+    for line in lines:
+        for product_id in line.quantities:
+            if product_id not in prices:
+                raise HTTPException(status_code=400, detail=f"Товар с ID {product_id} не найден")
+
+    return [
+        price_reservation(tariffs[line.bath_id], line.start, line.end, line.guests, prices, line.quantities)
+        for line in lines
+    ]
@@ -0,0 +1,129 @@
+import os
+from typing import Dict, List, Optional, Sequence, Type
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, create_model
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, schemas
+from app.pagination import NEXT_CURSOR_HEADER, cursor_int, decode_cursor, encode_cursor
+
+
+PAGE_SIZE = int(os.getenv("PRODUCTS_PAGE_SIZE", "500"))
+MAX_PAGE_SIZE = int(os.getenv("PRODUCTS_MAX_PAGE_SIZE", "2000"))
+
+# Поля, которые можно выбрать через fields=; каждое — одна колонка products
+COLUMNS = {
+    "id": models.Product.id,
+    "name": models.Product.name,
+    "description": models.Product.description,
+    "is_visible_on_website": func.coalesce(models.Product.is_visible_on_website, False),
+    "category_id": models.Product.category_id,
+    "total_quantity": func.coalesce(models.Product.total_quantity, 0),
+    "last_purchase_price": func.coalesce(models.Product.last_purchase_price, 0),
+    "unit_id": models.Product.unit_id,
+}
+
+# Поля схем Product и StockProduct; photos грузятся вторым запросом, только если запрошены
+PRODUCT_FIELDS = (*COLUMNS, "photos")
+STOCK_PRODUCT_FIELDS = ("id", "name", "description", "category_id", "total_quantity", "last_purchase_price", "unit_id")
+
+SORT_KEYS = {
+    "id": models.Product.id,
+    "name": models.Product.name,
+    "total_quantity": COLUMNS["total_quantity"],
+    "last_purchase_price": COLUMNS["last_purchase_price"],
+}
+# Какие значения ключа допустимы в курсоре: остальное — подделка, а не ошибка БД
+SORT_KEY_TYPES = {
+    "id": (int,),
+    "name": (str,),
+    "total_quantity": (int, float),
+    "last_purchase_price": (int, float),
+}
+
+FIELDS_DESCRIPTION = "Поля через запятую; по умолчанию все"
+
+
+def partial_schema(schema: Type[BaseModel]) -> Type[BaseModel]:
+    """Та же схема, но все поля необязательны: fields= может оставить любую их часть."""
+    return create_model(
+        f"{schema.__name__}Fields",
+        **{name: (Optional[field.annotation], None) for name, field in schema.model_fields.items()},
+    )
+
+
+# Для OpenAPI: ответ сериализуется напрямую, response_model у эндпоинтов нет
+PRODUCT_RESPONSES = {200: {"model": List[partial_schema(schemas.Product)]}}
+STOCK_PRODUCT_RESPONSES = {200: {"model": List[partial_schema(schemas.StockProduct)]}}
+SORT_DESCRIPTION = "id, name, total_quantity или last_purchase_price; с минусом — по убыванию"
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> List[str]:
+    if not fields:
+        return list(allowed)
+    selected = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in selected if name not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected or list(allowed)
+
+
+async def load_photos(db: AsyncSession, product_ids: List[int]) -> Dict[int, List[dict]]:
+    photos = {product_id: [] for product_id in product_ids}
+    if not product_ids:
+        return photos
+    rows = await db.execute(
+        select(models.Photo.product_id, models.Photo.photo_id, models.Photo.image_url, models.Photo.variants)
+        .where(models.Photo.product_id.in_(product_ids))
+        .order_by(models.Photo.photo_id)
+    )
+    for row in rows:
+        photos[row.product_id].append({"photo_id": row.photo_id, "image_url": row.image_url, "variants": row.variants})
+    return photos
+
+
+async def list_products(db: AsyncSession, allowed: Sequence[str], fields: Optional[str], sort: str,
+                        cursor: Optional[str], limit: int) -> JSONResponse:
+    """
+    Страница товаров по ключу (sort, id) одним запросом только нужных колонок, без ORM-объектов
+    и связей. Если есть следующая страница, её курсор возвращается в заголовке X-Next-Cursor;
+    курсор годится только для той же сортировки.
+    """
+    selected = parse_fields(fields, allowed)
+    descending = sort.startswith("-")
+    sort_name = sort.removeprefix("-")
+    key = SORT_KEYS.get(sort_name)
+    if key is None:
+        raise HTTPException(status_code=400, detail=f"Unknown sort: {sort}")
+
+    columns = [name for name in selected if name in COLUMNS]
+    query = select(
+        *(COLUMNS[name].label(name) for name in columns),
+        models.Product.id.label("_id"),
+        key.label("_key"),
+    )
+
+    if cursor is not None:
+        cursor_sort, after_key, after_id = decode_cursor(cursor, 3)
+        if cursor_sort != sort or isinstance(after_key, bool) or not isinstance(after_key, SORT_KEY_TYPES[sort_name]):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        position, after = tuple_(key, models.Product.id), tuple_(after_key, cursor_int(after_id))
+        query = query.where(position < after if descending else position > after)
+
+    order = (key.desc(), models.Product.id.desc()) if descending else (key, models.Product.id)
+    rows = (await db.execute(query.order_by(*order).limit(limit + 1))).mappings().all()
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(sort, rows[-1]["_key"], rows[-1]["_id"])
+
+    items = [{name: row[name] for name in columns} for row in rows]
+    if "photos" in selected:
+        photos = await load_photos(db, [row["_id"] for row in rows])
+        for item, row in zip(items, rows):
+            item["photos"] = photos[row["_id"]]
+    return JSONResponse(items, headers=headers)
@@ -0,0 +1,106 @@
+from collections import defaultdict
+from typing import Dict, Iterable
+
+from fastapi import HTTPException
+from sqlalchemy import Float, Integer, column, func, insert, or_, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import models
+
+
+# Причины движения в журнале stock_movements
+RESERVATION = "reservation"
+ENTRANCE = "entrance"
+
+
+def merge_items(items: Iterable) -> Dict[int, int]:
+    """Складывает количества повторяющихся товаров: {product_id: quantity}."""
+    quantities = defaultdict(int)
+    for item in items:
+        quantities[item.product_id] += item.quantity
+    return dict(quantities)
+
+
+async def lock_products(db: AsyncSession, product_ids: Iterable[int]) -> Dict[int, models.Product]:
+    """
+    Блокирует все нужные товары одним SELECT ... FOR UPDATE.
+    Порядок по id одинаков во всех запросах, поэтому параллельные брони не взаимоблокируются.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    products = (await db.scalars(
+        select(models.Product)
+        .where(models.Product.id.in_(product_ids))
+        .order_by(models.Product.id)
+        .with_for_update()
+    )).all()
+    return {p.id: p for p in products}
+
+
+def require_products(products: Dict[int, models.Product], product_ids: Iterable[int]) -> None:
+    for product_id in product_ids:
+        if product_id not in products:
+            raise HTTPException(status_code=400, detail=f"Товар с ID {product_id} не найден")
+
+
+async def apply_stock_changes(db: AsyncSession, products: Dict[int, models.Product], deltas: Dict[int, float],
+                              reason: str, reservation_id: int = None, document_id: int = None) -> None:
+    """
+    Меняет остатки заблокированных товаров одним UPDATE ... FROM (VALUES ...) RETURNING
+    и записывает движения в журнал stock_movements с остатком после каждого.
+    delta > 0 — приход или возврат, delta < 0 — списание. Списание проходит, только если
+    остаток не уходит в минус, поэтому не вернувшийся id означает нехватку товара.
+    """
+    changes = {pid: delta for pid, delta in deltas.items() if delta and pid in products}
+    if not changes:
+        return
+
+    stock_delta = values(
+        column("id", Integer), column("delta", Float), name="stock_delta"
+    ).data(sorted(changes.items()))
+    new_quantity = func.coalesce(models.Product.total_quantity, 0) + stock_delta.c.delta
+
+    stmt = update(models.Product)\
+        .where(models.Product.id == stock_delta.c.id, or_(new_quantity >= 0, stock_delta.c.delta > 0))\
+        .values(total_quantity=new_quantity)\
+        .returning(models.Product.id, models.Product.total_quantity)\
+        .execution_options(synchronize_session=False)
+    updated = {row.id: row.total_quantity for row in await db.execute(stmt)}
+
+    for product_id in sorted(changes):
+        if product_id not in updated:
+            raise HTTPException(status_code=400, detail=f"Недостаточно товара {products[product_id].name} на складе")
+
+    await db.execute(insert(models.StockMovement), [
+        {"product_id": product_id, "delta": changes[product_id], "balance": updated[product_id], "reason": reason,
+         "reservation_id": reservation_id, "document_id": document_id}
+        for product_id in sorted(changes)
+    ])
+
+    # Объекты уже в сессии — обновляем их без лишнего SELECT
+    for product_id, quantity in updated.items():
+        set_committed_value(products[product_id], "total_quantity", quantity)
+
+
+async def refresh_purchase_prices(db: AsyncSession, products: Dict[int, models.Product]) -> None:
+    """
+    last_purchase_price — цена из самого позднего документа прихода (по дате документа,
+    затем по id), одним запросом на все товары. Изменения документов должны быть уже
+    записаны flush. Если приходов не осталось — 0.
+    """
+    if not products:
+        return
+    item = models.EntranceDocumentItem
+    document = models.EntranceDocument
+    rows = await db.execute(
+        select(item.product_id, item.purchase_price)
+        .join(document, document.id == item.document_id)
+        .where(item.product_id.in_(products))
+        .distinct(item.product_id)
+        .order_by(item.product_id, document.date.desc(), document.id.desc(), item.id.desc())
+    )
+    prices = dict(rows.all())
+    for product_id, product in products.items():
+        product.last_purchase_price = prices.get(product_id, 0.0)
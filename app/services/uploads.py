@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Sequence
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+
+MB = 1024 * 1024
+
+PUBLIC_DIR = Path("public")
+# Имя загруженного файла — первые 32 hex-символа sha256 содержимого
+HASH_LENGTH = 32
+EXTENSION_ALIASES = {".jpeg": ".jpg", ".jpe": ".jpg", ".tif": ".tiff"}
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(MB)))
+MAX_UPLOAD_FILE_SIZE = int(os.getenv("MAX_UPLOAD_FILE_SIZE", str(20 * MB)))
+MAX_UPLOAD_REQUEST_SIZE = int(os.getenv("MAX_UPLOAD_REQUEST_SIZE", str(100 * MB)))
+# Сколько файлов одновременно пишется на диск во всём воркере
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+
+_write_slots = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+
+def too_large(limit: int, what: str = "Файл") -> HTTPException:
+    return HTTPException(status_code=413, detail=f"{what} больше {limit // MB} МБ")
+
+
+def safe_filename(filename: str) -> str:
+    """Только имя файла, без каталогов и пробелов."""
+    return os.path.basename(filename.replace("\\", "/")).replace(" ", "_") or "file"
+
+
+def url_for(path: Path) -> str:
+    """public/img/baths/ab/abc.jpg → /img/baths/ab/abc.jpg"""
+    return "/" + path.relative_to(PUBLIC_DIR).as_posix()
+
+
+def path_for(url: str) -> Optional[Path]:
+    """/img/baths/ab/abc.jpg → public/img/baths/ab/abc.jpg; None, если путь ведёт за пределы public/img."""
+    path = PUBLIC_DIR / url.lstrip("/")
+    # URL приходят и от клиентов (photo_urls): «..» и ссылки не должны выводить к чужим файлам
+    if not path.resolve().is_relative_to(PUBLIC_DIR.resolve() / "img"):
+        return None
+    return path
+
+
+def extension(filename: str) -> str:
+    suffix = os.path.splitext(safe_filename(filename))[1].lower()
+    suffix = EXTENSION_ALIASES.get(suffix, suffix)
+    return suffix if re.fullmatch(r"\.[a-z0-9]{1,5}", suffix) else ""
+
+
+def content_path(directory: Path, digest: str, ext: str) -> Path:
+    """Путь по хешу содержимого; подкаталог из двух первых символов — не больше 256 на уровень."""
+    return directory / digest[:2] / f"{digest[:HASH_LENGTH]}{ext}"
+
+
+def _store(source: BinaryIO, directory: Path, ext: str, limit: int) -> Path:
+    """
+    Кусками во временный файл, попутно считая sha256, затем атомарное переименование
+    в путь по хешу. Если такие байты уже сохранены, вторая копия не создаётся.
+    """
+    tmp = directory / f".upload.{uuid.uuid4().hex}.tmp"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp, "wb") as out:
+            while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > limit:
+                    raise too_large(limit)
+                digest.update(chunk)
+                out.write(chunk)
+        target = content_path(directory, digest.hexdigest(), ext)
+        if target.exists():
+            tmp.unlink()
+            # Свежий mtime: сборщик неиспользуемых фото не тронет файл, пока запись не закоммичена
+            os.utime(target)
+        else:
+            target.parent.mkdir(exist_ok=True)
+            os.replace(tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return target
+
+
+async def save_upload(file: UploadFile, directory: Path, limit: int = MAX_UPLOAD_FILE_SIZE) -> Path:
+    """Сохраняет один файл в пуле потоков, не блокируя цикл событий; возвращает путь."""
+    if file.size is not None and file.size > limit:
+        raise too_large(limit)
+    async with _write_slots:
+        await file.seek(0)
+        return await run_in_threadpool(_store, file.file, directory, extension(file.filename or ""), limit)
+
+
+async def save_uploads(files: Sequence[UploadFile], directory: Path) -> List[str]:
+    """
+    Сохраняет файлы запроса параллельно и возвращает их URL. Уже сохранённые файлы
+    при ошибке не удаляются: тот же файл может понадобиться другой записи. Если на него
+    никто не сошлётся, его уберёт сборщик неиспользуемых фото.
+    """
+    total = sum(file.size or 0 for file in files)
+    if total > MAX_UPLOAD_REQUEST_SIZE:
+        raise too_large(MAX_UPLOAD_REQUEST_SIZE, "Запрос")
+
+    paths = await asyncio.gather(*(save_upload(file, directory) for file in files))
+    return [url_for(path) for path in paths]
+
+
+class UploadLimitMiddleware:
+    """
+    Ограничивает тело multipart-запросов ещё при приёме: Starlette разбирает форму до
+    вызова обработчика, поэтому проверять размер в самом обработчике уже поздно.
+    """
+
+    def __init__(self, app, limit: int = MAX_UPLOAD_REQUEST_SIZE):
+        self.app = app
+        self.limit = limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/"):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.limit:
+            error = too_large(self.limit, "Запрос")
+            await JSONResponse({"detail": error.detail}, status_code=error.status_code)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    # FastAPI пробрасывает HTTPException из разбора тела как есть — клиент получит 413
+                    raise too_large(self.limit, "Запрос")
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+from app.services import events
+
+
+# Сколько секунд проверенный пользователь живёт в кеше; 0 — кеш выключен, каждый запрос идёт в БД
+USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1024"))
+
+USERS_CHANGED = "users.changed"
+
+
+class CachedUser(BaseModel):
+    """Активный пользователь из токена: только колонки users, без ORM-объекта и сессии."""
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+    user_id: int
+    username: str
+    full_name: str
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    birth_date: Optional[date] = None
+    role_id: int
+    is_active: bool
+    created_at: Optional[datetime] = None
+
+
+class UserCache:
+    """
+    LRU с TTL по user_id. Сброс увеличивает поколение, поэтому пользователь,
+    прочитанный из БД до изменения, в кеш уже не попадёт.
+    """
+
+    def __init__(self, ttl: float, size: int):
+        self._ttl = ttl
+        self._size = size
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._ttl > 0 and self._size > 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, user_id: int) -> Optional[CachedUser]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, loaded_at = entry
+            if time.monotonic() - loaded_at > self._ttl:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def put(self, user: CachedUser, generation: int) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[user.user_id] = (user, time.monotonic())
+            self._entries.move_to_end(user.user_id)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id: Optional[int] = None) -> None:
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+cache = UserCache(USER_CACHE_TTL_SECONDS, USER_CACHE_SIZE)
+
+
+async def invalidate(user_id: int) -> None:
+    """Вызывать после commit изменения или удаления пользователя — и в других воркерах тоже."""
+    cache.discard(user_id)
+    await events.publish({"type": USERS_CHANGED, "user_id": user_id, "internal": True})
+
+
+def handle_event(event: dict) -> None:
+    if event.get("type") == USERS_CHANGED:
+        cache.discard(event.get("user_id"))
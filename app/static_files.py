@@ -0,0 +1,80 @@
+import mimetypes
+import os
+import re
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from app.services.uploads import HASH_LENGTH
+
+
+# Файлы с именем по хешу содержимого (и их копии abc.thumb.webp) никогда не меняются
+CONTENT_ADDRESSED_NAME = re.compile(rf"^[0-9a-f]{{{HASH_LENGTH}}}(\.[a-z]+)?\.[a-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Старые файлы с клиентскими именами могли перезаписываться — только с проверкой ETag
+REVALIDATE = "public, no-cache"
+
+# Заранее сжатые копии рядом с файлом: logo.svg.br, logo.svg.gz — в порядке предпочтения
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# Форматы, которые уже сжаты, — для них .br/.gz не ищутся
+COMPRESSED_TYPES = ("image/jpeg", "image/png", "image/webp", "image/gif", "image/avif")
+
+
+def accepted_encodings(header: str) -> set:
+    """gzip, br;q=0.8, deflate;q=0 → {"gzip", "br"}"""
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    StaticFiles для загруженных фото: файлы по хешу кешируются навсегда (immutable)
+    со строгим ETag из имени, остальные — с обязательной перепроверкой. Если рядом
+    лежит .br/.gz-копия и клиент её принимает, отдаётся она.
+    """
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        name = os.path.basename(full_path)
+        media_type = mimetypes.guess_type(name)[0] or "text/plain"
+        headers = {}
+
+        encoding = None
+        if not media_type.startswith(COMPRESSED_TYPES):
+            headers["Vary"] = "Accept-Encoding"
+            accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+            for candidate, suffix in ENCODINGS:
+                if candidate not in accepted:
+                    continue
+                try:
+                    encoded_stat = os.stat(full_path + suffix)
+                except OSError:
+                    continue
+                full_path, stat_result, encoding = full_path + suffix, encoded_stat, candidate
+                headers["Content-Encoding"] = encoding
+                break
+
+        if CONTENT_ADDRESSED_NAME.match(name):
+            headers["Cache-Control"] = IMMUTABLE
+            headers["ETag"] = f'"{name}-{encoding}"' if encoding else f'"{name}"'
+        else:
+            headers["Cache-Control"] = REVALIDATE
+
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result,
+                                headers=headers, media_type=media_type)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
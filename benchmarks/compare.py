@@ -0,0 +1,62 @@
+"""
+Сравнение двух прогонов benchmarks.run:
+
+    python -m benchmarks.compare benchmarks/results/abc1234-uvicorn.json benchmarks/results/def5678-uvicorn.json
+
+Для задержек рост — ухудшение, для пропускной способности — улучшение.
+"""
+import argparse
+import json
+from pathlib import Path
+
+
+METRICS = [
+    # (ключ, подпись, больше — лучше)
+    ("throughput_rps", "rps", True),
+    ("p50_ms", "p50 ms", False),
+    ("p95_ms", "p95 ms", False),
+    ("p99_ms", "p99 ms", False),
+]
+
+
+def change(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение результатов бенчмарка")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="ухудшение в процентах, после которого строка помечается «!»")
+    args = parser.parse_args(argv)
+
+    baseline = json.loads(args.baseline.read_text())
+    candidate = json.loads(args.candidate.read_text())
+    print(f"{baseline['commit']} ({baseline['mode']}) -> {candidate['commit']} ({candidate['mode']})")
+    if baseline["settings"] != candidate["settings"]:
+        print(f"Внимание: разные настройки прогона {baseline['settings']} / {candidate['settings']}")
+
+    regressions = 0
+    for name, after in candidate["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            print(f"{name:20} новый сценарий")
+            continue
+        cells = []
+        worse = False
+        for key, label, higher_is_better in METRICS:
+            cells.append(f"{label} {before[key]} -> {after[key]} ({change(before[key], after[key])})")
+            if before[key]:
+                delta = (after[key] - before[key]) / before[key] * 100
+                worse |= (-delta if higher_is_better else delta) > args.threshold
+        regressions += worse
+        print(f"{'!' if worse else ' '} {name:20} " + "  ".join(cells))
+
+    print(f"Ухудшений больше {args.threshold}%: {regressions}")
+
+
+if __name__ == "__main__":
+    main()
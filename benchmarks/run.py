@@ -0,0 +1,303 @@
+"""
+Нагрузочный прогон горячих эндпоинтов. Запуск из корня проекта (база — из DATABASE_URL,
+заполненная python -m benchmarks.seed):
+
+    python -m benchmarks.run --mode inprocess
+    python -m benchmarks.run --mode uvicorn --workers 4 --concurrency 32
+
+Результат пишется в benchmarks/results/<commit>-<mode>.json; два файла сравнивает
+python -m benchmarks.compare.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, NamedTuple
+
+import httpx
+
+
+RESULTS_DIR = Path(__file__).parent / "results"
+PROJECT_DIR = Path(__file__).parent.parent
+
+
+class Scenario(NamedTuple):
+    name: str
+    # Делает один запрос и возвращает ответ; state — общие данные прогона (токен, id и т. п.)
+    request: Callable[[httpx.AsyncClient, dict, random.Random], Awaitable[httpx.Response]]
+    expected: tuple = (200,)
+
+
+async def baths_list(client, state, rng):
+    return await client.get("/api/baths/")
+
+
+async def booking_create(client, state, rng):
+    return await client.post("/api/bookings/", json={
+        "bath_id": rng.choice(state["bath_ids"]),
+        "date": (datetime(2030, 1, 1) + timedelta(days=rng.randint(0, 365))).strftime("%Y-%m-%d"),
+        "duration_hours": rng.randint(2, 5),
+        "guests": rng.randint(1, 8),
+        "name": "Бенчмарк",
+        "phone": "+79990000000",
+    })
+
+
+async def bookings_inbox(client, state, rng):
+    return await client.get("/api/bookings/", params={"unread": "true"} if rng.random() < 0.5 else None)
+
+
+async def bookings_unread_count(client, state, rng):
+    return await client.get("/api/bookings/unread-count")
+
+
+async def reservations_list(client, state, rng):
+    start = datetime(2020, 1, 1) + timedelta(days=rng.randint(0, 360))
+    return await client.get("/api/admin/reservations/", headers=state["auth"], params={
+        "from": start.isoformat(), "to": (start + timedelta(days=7)).isoformat(),
+    })
+
+
+async def reservation_create(client, state, rng):
+    # Каждая бронь прогона — в своём трёхчасовом окне далеко в будущем, пересечений нет
+    slot = next(state["slots"])
+    start = state["slot_base"] + timedelta(hours=3 * slot)
+    response = await client.post("/api/admin/reservations/", headers=state["auth"], json={
+        "bath_id": state["bath_ids"][slot % len(state["bath_ids"])],
+        "start_datetime": start.isoformat(),
+        "end_datetime": (start + timedelta(hours=2)).isoformat(),
+        "client_name": "Бенчмарк",
+        "client_phone": "+79990000000",
+        "guests": rng.randint(1, 8),
+    })
+    if response.status_code == 201:
+        state["created"].append(response.json()["reservation_id"])
+    return response
+
+
+async def reservation_update(client, state, rng):
+    reservation_id = rng.choice(state["created"])
+    return await client.put(f"/api/admin/reservations/{reservation_id}", headers=state["auth"], json={
+        "guests": rng.randint(1, 8),
+        "notes": f"обновлено {rng.random()}",
+    })
+
+
+async def products_list(client, state, rng):
+    return await client.get("/api/admin/products/", headers=state["auth"])
+
+
+async def products_page(client, state, rng):
+    # Экран склада: одна страница, только показываемые колонки
+    return await client.get("/api/admin/stock/products", headers=state["auth"], params={
+        "fields": "id,name,total_quantity,unit_id", "sort": "name", "limit": 50,
+    })
+
+
+async def products_search(client, state, rng):
+    # Как при наборе в поле подбора: названия сгенерированных товаров — «Товар N»
+    return await client.get("/api/admin/products/search", headers=state["auth"], params={
+        "q": str(rng.randint(1, 999)),
+    })
+
+
+async def category_tree(client, state, rng):
+    return await client.get("/api/admin/categories/tree", headers=state["auth"], params={"include_stats": "true"})
+
+
+async def documents_list(client, state, rng):
+    return await client.get("/api/admin/documents/entrance/", headers=state["auth"])
+
+
+# Порядок важен: reservation_update меняет брони, созданные reservation_create
+SCENARIOS = [
+    Scenario("baths_list", baths_list),
+    Scenario("booking_create", booking_create),
+    Scenario("bookings_inbox", bookings_inbox),
+    Scenario("bookings_unread_count", bookings_unread_count),
+    Scenario("reservations_list", reservations_list),
+    Scenario("reservation_create", reservation_create, (201,)),
+    Scenario("reservation_update", reservation_update),
+    Scenario("products_list", products_list),
+    Scenario("products_page", products_page),
+    Scenario("products_search", products_search),
+    Scenario("category_tree", category_tree),
+    Scenario("documents_list", documents_list),
+]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+async def run_scenario(client, scenario: Scenario, state: dict, requests: int, concurrency: int, seed: int) -> dict:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    remaining = iter(range(requests))
+
+    async def worker(worker_id: int):
+        rng = random.Random(seed * 1000 + worker_id)
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await scenario.request(client, state, rng)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            if status not in scenario.expected:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+async def prepare_state(client, args) -> dict:
+    response = await client.post("/api/admin/login", data={"username": args.username, "password": args.password})
+    response.raise_for_status()
+    baths = (await client.get("/api/baths/")).json()
+    if not baths:
+        sys.exit("В базе нет бань — сначала python -m benchmarks.seed")
+    rng = random.Random()
+    return {
+        "auth": {"Authorization": f"Bearer {response.json()['access_token']}"},
+        "bath_ids": [b["bath_id"] for b in baths],
+        # Случайная точка отсчёта: брони разных прогонов не пересекаются
+        "slot_base": datetime(2100, 1, 1, tzinfo=timezone.utc) + timedelta(days=rng.randint(0, 300000)),
+        "slots": iter(range(10 ** 9)),
+        "created": [],
+    }
+
+
+@asynccontextmanager
+async def inprocess_client(args):
+    """Приложение в том же процессе через ASGITransport — без сети и сериализации HTTP."""
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield client
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@asynccontextmanager
+async def uvicorn_client(args):
+    """Настоящий uvicorn в отдельном процессе — как в продакшене."""
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--no-access-log", "--log-level", "warning"],
+        cwd=PROJECT_DIR,
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/api/admin/reservation-status/")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                sys.exit("uvicorn не запустился")
+            yield client
+    finally:
+        server.terminate()
+        server.wait(10)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def main_async(args) -> dict:
+    selected = [s for s in SCENARIOS if not args.only or s.name in args.only]
+    client_factory = inprocess_client if args.mode == "inprocess" else uvicorn_client
+    results = {}
+    async with client_factory(args) as client:
+        state = await prepare_state(client, args)
+        for scenario in selected:
+            if scenario.name == "reservation_update" and not state["created"]:
+                print("reservation_update пропущен: нет броней от reservation_create")
+                continue
+            # Прогрев: соединения пула, кеши, JIT-пути Python
+            await run_scenario(client, scenario, state, args.warmup, args.concurrency, args.seed)
+            result = await run_scenario(client, scenario, state, args.requests, args.concurrency, args.seed)
+            results[scenario.name] = result
+            print(f"{scenario.name:20} {result['throughput_rps']:>9} rps  p50 {result['p50_ms']:>8} ms  "
+                  f"p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  errors {result['errors'] or '-'}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк горячих эндпоинтов")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--requests", type=int, default=2000, help="запросов на сценарий")
+    parser.add_argument("--warmup", type=int, default=100, help="запросов прогрева на сценарий")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1, help="воркеров uvicorn (только --mode uvicorn)")
+    parser.add_argument("--only", nargs="*", help="запустить только эти сценарии")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--output", type=Path, help="файл результата (по умолчанию benchmarks/results/<commit>-<mode>.json)")
+    args = parser.parse_args(argv)
+
+    os.chdir(PROJECT_DIR)
+    sys.path.insert(0, str(PROJECT_DIR))
+    commit = git_commit()
+    results = asyncio.run(main_async(args))
+
+    output = args.output or RESULTS_DIR / f"{commit}-{args.mode}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "commit": commit,
+        "mode": args.mode,
+        "workers": args.workers if args.mode == "uvicorn" else None,
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"requests": args.requests, "warmup": args.warmup, "concurrency": args.concurrency, "seed": args.seed},
+        "scenarios": results,
+    }, ensure_ascii=False, indent=2))
+    print(f"Результат: {output}")
+
+
+if __name__ == "__main__":
+    main()
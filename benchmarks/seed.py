@@ -0,0 +1,36 @@
+"""
+Наполняет локальную базу для бенчмарков. Запуск из корня проекта:
+
+    python -m benchmarks.seed --reset --scale 1
+
+База берётся из DATABASE_URL (.env). --reset очищает все таблицы приложения —
+запускать только на отдельной базе для бенчмарков. Данные создаёт генератор
+app.generate_data; здесь — только объёмы, на которых сравниваются коммиты.
+"""
+import argparse
+import time
+
+from app import generate_data
+
+
+# Объёмы при --scale 1 (12 бань, 2 000 товаров, 5 000 документов, 20 000 заявок)
+RESERVATIONS = 50000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Данные для бенчмарков")
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель объёмов по умолчанию")
+    parser.add_argument("--reset", action="store_true", help="очистить таблицы перед заполнением")
+    parser.add_argument("--seed", type=int, default=42, help="зерно генератора — одинаковые данные при повторе")
+    args = parser.parse_args(argv)
+
+    volumes = generate_data.default_volumes(max(1, int(RESERVATIONS * args.scale)))
+    volumes["baths"] = 12
+
+    started = time.perf_counter()
+    generate_data.generate(volumes, args.seed, args.reset)
+    print(f"Готово за {time.perf_counter() - started:.1f} с: {volumes}")
+
+
+if __name__ == "__main__":
+    main()